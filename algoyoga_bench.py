@@ -0,0 +1,166 @@
+#! /usr/bin/python
+
+""" Benchmark harness for the modules of algorithm-yoga.
+
+Every module registers its workloads by subclassing BaseBench (just like the
+unit tests subclass BaseTest). A workload is a method that takes an input
+size n, prepares the input and returns a pair (run, items): run is the
+function to be timed and items is the number of items it processes, which
+is used to compute the throughput. A workload that does not apply at some
+size (a quadratic reference implementation at large sizes, or one that
+needs numpy when it is not installed) returns None and is skipped.
+
+The results of a benchmark run are plain dictionaries, so they can be dumped
+to JSON and compared against a stored baseline with compare(). The command
+line runner is run_benchmarks.py.
+"""
+
+import gc
+import os
+import json
+import timeit
+
+try:
+    import tracemalloc
+except ImportError: # python 2, fall back to resource usage of a child process
+    tracemalloc = None
+try:
+    import resource
+except ImportError: # not a unix system, peak memory is not measured
+    resource = None
+
+class BaseBench(object):
+    """ Base class for the benchmarks in each module. """
+    def __init__(self, modname, workloads, sizes):
+        """ Initialize benchmark object. Takes the name of the module, a list
+        of workloads and a list of input sizes to run every workload at. This
+        method is designed to be called via super().
+        """
+        self.modname = modname
+        self.workloads = workloads
+        self.sizes = sizes
+
+    def run_benchmarks(self, warmup=1, repeat=5, sizes=None):
+        """ Run every workload at every size. Return a dictionary mapping
+        names of the form "module.workload[n=size]" to the measurements
+        (see measure()). """
+        print "Benchmarking module {!s}".format(self.modname)
+        results = dict()
+        for workload in self.workloads:
+            for n in (sizes or self.sizes):
+                name = "{!s}.{!s}[n={!s}]".format(self.modname, workload.func_name, n)
+                prepared = workload(n)
+                if prepared is None:
+                    continue
+                run, items = prepared
+                result = measure(run, items, warmup, repeat)
+                print "{!s}: {:.6f} sec, {:.0f} items/sec".format(name, result["median"],
+                        result["throughput"])
+                results[name] = result
+        return results
+
+def measure(run, items, warmup=1, repeat=5):
+    """ Time the function run. It is called warmup times without being
+    measured and then repeat times with the timer on. Return a dictionary
+    containing the timings in seconds, the throughput in items per second
+    and the memory statistics (see measure_memory()). """
+    for _ in range(warmup):
+        run()
+    timings = []
+    for _ in range(repeat):
+        start = timeit.default_timer()
+        run()
+        timings.append(timeit.default_timer()-start)
+    timings.sort()
+    median = timings[len(timings)//2]
+    result = {
+            "items": items,
+            "repeat": repeat,
+            "min": timings[0],
+            "median": median,
+            "mean": sum(timings)/len(timings),
+            "throughput": items/median if median > 0 else float("inf"),
+            }
+    result.update(measure_memory(run))
+    return result
+
+def _memory_stats(run):
+    """ Call run once and return the number of objects that are still
+    alive right after the call (the growth in objects tracked by the
+    garbage collector, including the returned result) and its peak memory
+    use in kilobytes. This is not an allocation count: temporary objects
+    that were freed during the call and objects that the garbage collector
+    does not track (ints, strings) are not counted. Without tracemalloc
+    the peak is the growth of the maximum resident set size, so memory
+    that the interpreter reuses from its own heap is not counted. """
+    gc.collect()
+    objects_before = len(gc.get_objects())
+    if tracemalloc is not None:
+        tracemalloc.start()
+        result = run()
+        peak = tracemalloc.get_traced_memory()[1] // 1024
+        tracemalloc.stop()
+    elif resource is not None:
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        result = run()
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+    else:
+        result = run()
+        peak = None
+    retained = len(gc.get_objects()) - objects_before
+    del result
+    return {"retained_objects": retained, "peak_memory_kb": peak}
+
+def measure_memory(run):
+    """ Return the memory statistics of one call of run. The peak memory use
+    is measured with tracemalloc if it is available. Otherwise the call is
+    made in a forked child process, whose maximum resident set size only
+    reflects this call and not the earlier workloads. """
+    if tracemalloc is not None or not hasattr(os, "fork"):
+        return _memory_stats(run)
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0: # child
+        try:
+            os.close(read_end)
+            os.write(write_end, json.dumps(_memory_stats(run)))
+        finally:
+            os._exit(0)
+    os.close(write_end)
+    chunks = []
+    while True:
+        chunk = os.read(read_end, 4096)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    os.close(read_end)
+    os.waitpid(pid, 0)
+    if not chunks: # the child failed
+        return {"retained_objects": None, "peak_memory_kb": None}
+    return json.loads("".join(chunks))
+
+def compare(results, baseline, tolerance=0.1):
+    """ Compare benchmark results with a baseline (both as returned by
+    BaseBench.run_benchmarks). Return a list of (name, baseline median,
+    current median) tuples for the workloads whose median time grew by
+    more than tolerance (a fraction of the baseline median). Workloads
+    missing from either side are ignored.
+
+    >>> baseline = {"a": {"median": 1.0}, "b": {"median": 2.0}, "c": {"median": 1.0}}
+    >>> results = {"a": {"median": 1.05}, "b": {"median": 3.0}, "d": {"median": 9.0}}
+    >>> compare(results, baseline)
+    [('b', 2.0, 3.0)]
+    """
+    regressions = []
+    for name in sorted(results):
+        if name not in baseline:
+            continue
+        old = baseline[name]["median"]
+        new = results[name]["median"]
+        if new > old*(1+tolerance):
+            regressions.append((name, old, new))
+    return regressions
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -1,7 +1,18 @@
 #! /usr/bin/python
 
+import bisect
+import random
+from array import array
+
+from algoyoga_bench import BaseBench
+
+try:
+    import numpy
+except ImportError: # numpy is optional, it only speeds up batch searches
+    numpy = None
+
 def binary_search(lst, item):
-    """ Perform binary search on a sorted list. 
+    """ Perform binary search on a sorted list.
     Return the index of the element if it is in
     the list, otherwise return -1.
     """
@@ -20,8 +31,265 @@ def binary_search(lst, item):
         return low
     return -1
 
+def lower_bound(lst, item, low=0, high=None):
+    """ Return the first index i in lst[low:high] such that
+    lst[i] >= item. If there is no such index return high.
+    Among duplicates this is always the leftmost one.
+
+    >>> lower_bound([1,1,1,2,2,2,3], 2)
+    3
+    >>> lower_bound([1,1,1,2,2,2,3], 0)
+    0
+    >>> lower_bound([1,1,1,2,2,2,3], 4)
+    7
+    >>> lower_bound([], 4)
+    0
+    """
+    if high is None:
+        high = len(lst)
+    while low < high:
+        middle = (low+high)//2
+        if lst[middle] < item:
+            low = middle+1
+        else:
+            high = middle
+    return low
+
+def upper_bound(lst, item, low=0, high=None):
+    """ Return the first index i in lst[low:high] such that
+    lst[i] > item. If there is no such index return high.
+
+    >>> upper_bound([1,1,1,2,2,2,3], 2)
+    6
+    >>> upper_bound([1,1,1,2,2,2,3], 0)
+    0
+    >>> upper_bound([1,1,1,2,2,2,3], 3)
+    7
+    """
+    if high is None:
+        high = len(lst)
+    while low < high:
+        middle = (low+high)//2
+        if item < lst[middle]:
+            high = middle
+        else:
+            low = middle+1
+    return low
+
+def search_many(lst, queries, side="left", sorted_queries=False):
+    """ Return the insertion positions of all the items in queries
+    (just like numpy.searchsorted). With side="left" every position is
+    the lower bound of the query, with side="right" it is the upper bound.
+
+    If both arguments are numpy arrays the whole batch is answered with
+    a single call to numpy.searchsorted. If the queries are known to be
+    sorted (sorted_queries=True) every search starts where the previous
+    one ended, which takes O(q*log(n/q)) comparisons for q queries in a
+    sequence of n items. That only pays off if reading an item is
+    expensive (for example in a memory-mapped search_index.MappedArray):
+    for lists, tuples and arrays the bisect module compares in C, which is
+    faster than any loop in python, so these are always searched one query
+    at a time.
+
+    >>> search_many([1,1,1,2,2,2,3], [2,0,4,3])
+    [3, 0, 7, 6]
+    >>> search_many([1,1,1,2,2,2,3], [2,0,4,3], side="right")
+    [6, 0, 7, 7]
+    >>> search_many([1,1,1,2,2,2,3], [0,1,2,2,5], sorted_queries=True)
+    [0, 0, 3, 3, 7]
+    >>> search_many([1,1,1,2,2,2,3], [0,1,2,2,5], "right", True)
+    [0, 3, 6, 6, 7]
+    >>> search_many([], [1,2])
+    [0, 0]
+    """
+    assert side in ["left", "right"]
+    if numpy is not None and isinstance(lst, numpy.ndarray) \
+            and isinstance(queries, numpy.ndarray):
+        return numpy.searchsorted(lst, queries, side=side)
+    if sorted_queries and not isinstance(lst, (list, tuple, array)):
+        return _gallop_search(lst, queries, side)
+    # the C implementation in bisect has exactly the same semantics
+    # as lower_bound and upper_bound
+    if side == "left":
+        find = bisect.bisect_left
+    else:
+        find = bisect.bisect_right
+    return [find(lst, query) for query in queries]
+
+def _gallop_search(lst, queries, side):
+    """ Find the positions of sorted queries. The position of every query
+    is at least the position of the previous one, so we gallop from there
+    (steps of 1, 2, 4, ...) until we pass the query and then binary search
+    in the last step. """
+    positions = []
+    length = len(lst)
+    ind = 0 # the position is at least ind
+    if side == "left":
+        for query in queries:
+            high = ind
+            step = 1
+            while high < length and lst[high] < query:
+                ind = high+1
+                high += step
+                step *= 2
+            ind = bisect.bisect_left(lst, query, ind, min(high, length))
+            positions.append(ind)
+    else:
+        for query in queries:
+            high = ind
+            step = 1
+            while high < length and not query < lst[high]:
+                ind = high+1
+                high += step
+                step *= 2
+            ind = bisect.bisect_right(lst, query, ind, min(high, length))
+            positions.append(ind)
+    return positions
+
+def interpolation_search(lst, item):
+    """ Perform interpolation search on a sorted list of numbers. The
+    return value is the same as for binary_search (the index of item or
+    -1), but among duplicates it is always the leftmost index. On
+    uniformly distributed data this needs O(log log n) probes. When the
+    interpolation steps stop halving the range (the data is badly
+    distributed), the search falls back to binary search.
+
+    >>> interpolation_search([1,2,4,8,16,32,64], 16)
+    4
+    >>> interpolation_search([1,2,4,8,16,32,64], 15)
+    -1
+    >>> interpolation_search([1,1,1,2,2,2,3], 2)
+    3
+    >>> interpolation_search([], 2)
+    -1
+    """
+    low = 0
+    high = len(lst)
+    bad_steps = 0 # number of steps that did not halve the range
+    while low < high:
+        low_val = lst[low]
+        high_val = lst[high-1]
+        if item <= low_val:
+            break
+        if item > high_val:
+            low = high
+            break
+        # low_val < item <= high_val, so the division is safe
+        pos = low + int((item-low_val) * (high-1-low) / float(high_val-low_val))
+        size = high-low
+        if lst[pos] < item:
+            low = pos+1
+        else:
+            high = pos
+        if 2*(high-low) > size:
+            bad_steps += 1
+            if bad_steps > 2:
+                low = lower_bound(lst, item, low, high)
+                break
+    if low < len(lst) and lst[low] == item:
+        return low
+    return -1
+
+def exponential_search(lst, item, hint=0):
+    """ Search a sorted list for item starting at the index hint. The
+    search doubles its step until it jumps over item and then performs
+    a binary search on the last step, so it takes O(log d) probes where
+    d is the distance between hint and item. Return the (leftmost)
+    index of item or -1 if it is not in the list.
+
+    >>> exponential_search(range(100), 42)
+    42
+    >>> exponential_search(range(100), 42, hint=99)
+    42
+    >>> exponential_search([1,1,1,2,2,2,3], 2, hint=5)
+    3
+    >>> exponential_search([1,1,1,2,2,2,3], 5, hint=3)
+    -1
+    >>> exponential_search([], 2)
+    -1
+    """
+    length = len(lst)
+    if length == 0:
+        return -1
+    hint = min(max(hint, 0), length-1)
+    bound = 1
+    if lst[hint] < item: # gallop to the right
+        while hint+bound < length and lst[hint+bound] < item:
+            bound *= 2
+        pos = lower_bound(lst, item, hint+bound//2+1, min(hint+bound, length))
+    else: # gallop to the left
+        while hint-bound >= 0 and not lst[hint-bound] < item:
+            bound *= 2
+        pos = lower_bound(lst, item, max(hint-bound+1, 0), hint-bound//2)
+    if pos < length and lst[pos] == item:
+        return pos
+    return -1
+
+class BinarySearchBench(BaseBench):
+    """ Benchmarks for the search functions. Every run looks up 1000 keys. """
+    def __init__(self):
+        workloads = [self.bench_binary_search, self.bench_interpolation_search,
+                self.bench_exponential_search, self.bench_search_many,
+                self.bench_search_many_sorted,
+                self.bench_binary_search_near_start, self.bench_exponential_search_near_start]
+        super(BinarySearchBench, self).__init__("binary_search", workloads, [10**3, 10**5, 10**6])
+
+    def _lookups(self, searchfunc, n, near_start=False):
+        keys = sorted(random.sample(xrange(4*n), n))
+        if near_start:
+            queries = [keys[random.randrange(min(n, 100))] for _ in xrange(1000)]
+        else:
+            queries = [random.randrange(4*n) for _ in xrange(1000)]
+        def run():
+            for query in queries:
+                searchfunc(keys, query)
+        return run, len(queries)
+
+    def bench_binary_search(self, n):
+        """ binary_search with uniformly distributed keys and queries """
+        return self._lookups(binary_search, n)
+
+    def bench_interpolation_search(self, n):
+        """ interpolation_search with uniformly distributed keys and queries """
+        return self._lookups(interpolation_search, n)
+
+    def bench_exponential_search(self, n):
+        """ exponential_search with uniformly distributed keys and queries """
+        return self._lookups(exponential_search, n)
+
+    def bench_binary_search_near_start(self, n):
+        """ binary_search with queries among the first 100 keys """
+        return self._lookups(binary_search, n, near_start=True)
+
+    def bench_exponential_search_near_start(self, n):
+        """ exponential_search with queries among the first 100 keys """
+        return self._lookups(exponential_search, n, near_start=True)
+
+    def _batch(self, n):
+        """ Return the keys in a memory-mapped MappedArray (where reading an
+        item is a python call, so the number of probes matters) and a sorted
+        batch of 10000 queries. """
+        import struct
+        from search_index import MappedArray # search_index imports this module
+        keys = sorted(random.sample(xrange(4*n), n))
+        buf = struct.pack("<%dq" % n, *keys)
+        queries = sorted(random.randrange(4*n) for _ in xrange(10000))
+        return MappedArray(buf, 0, n), queries
+
+    def bench_search_many(self, n):
+        """ search_many on a MappedArray with a sorted batch of 10000
+        queries, searched one by one (for reference) """
+        keys, queries = self._batch(n)
+        return (lambda: search_many(keys, queries)), len(queries)
+
+    def bench_search_many_sorted(self, n):
+        """ search_many on a MappedArray with a sorted batch of 10000
+        queries (sorted_queries=True) """
+        keys, queries = self._batch(n)
+        return (lambda: search_many(keys, queries, sorted_queries=True)), len(queries)
+
 class unit_test:
-    """ 
+    """
     >>> binary_search(range(1000), 547)
     547
     >>> binary_search(range(1000), 999)
@@ -38,6 +306,43 @@ class unit_test:
     True
     >>> binary_search([1,1,1,1,1,2,2,2], 3)
     -1
+    >>> import random
+    >>> lst = sorted(random.randrange(100) for _ in range(1000))
+    >>> queries = [random.randrange(-10, 110) for _ in range(1000)]
+    >>> all(lower_bound(lst, q) == bisect.bisect_left(lst, q) for q in queries)
+    True
+    >>> all(upper_bound(lst, q) == bisect.bisect_right(lst, q) for q in queries)
+    True
+    >>> (search_many(lst, sorted(queries), sorted_queries=True) ==
+    ...     search_many(lst, sorted(queries)))
+    True
+    >>> (search_many(lst, sorted(queries), "right", True) ==
+    ...     search_many(lst, sorted(queries), "right"))
+    True
+    >>> few = sorted(random.sample(queries, 5))
+    >>> all(_gallop_search(lst, qs, side) == search_many(lst, qs, side)
+    ...     for qs in [few, sorted(queries), []] for side in ["left", "right"])
+    True
+    >>> if numpy is not None: # the numpy.searchsorted path
+    ...     for side in ["left", "right"]:
+    ...         positions = search_many(numpy.array(lst), numpy.array(queries), side)
+    ...         assert isinstance(positions, numpy.ndarray)
+    ...         assert list(positions) == search_many(lst, queries, side)
+    >>> interp_results = [interpolation_search(lst, q) for q in queries]
+    >>> all(ind == -1 or lst[ind] == q for ind, q in zip(interp_results, queries))
+    True
+    >>> [ind == -1 for ind in interp_results] == [q not in lst for q in queries]
+    True
+    >>> skewed = sorted(2**random.randrange(60) for _ in range(1000))
+    >>> all(interpolation_search(skewed, q) == lower_bound(skewed, q)
+    ...     for q in skewed)
+    True
+    >>> all(exponential_search(lst, q, hint) == lower_bound(lst, q)
+    ...     for q in lst[::7] for hint in [0, 10, 500, 999])
+    True
+    >>> all(exponential_search(lst, q, hint) == -1
+    ...     for q in [-5, 101, 200] for hint in [0, 500, 999])
+    True
     """
 
 if __name__ == "__main__":
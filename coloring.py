@@ -0,0 +1,233 @@
+#! /usr/bin/env python
+
+""" Vertex coloring of undirected graphs.
+
+The algorithms that are implemented in this module are:
+    greedy_color(graph) - color the vertices greedily in smallest-last order
+
+    dsatur_color(graph, deadline=None) - color the vertices with DSATUR
+
+    best_color(graph, time_budget=None) - run both and return the coloring
+    with fewer colors
+
+A coloring is a dict mapping every node to its color (0, 1, 2, ...). The
+graph is a dict mapping nodes to the list of their neighbours; edges are
+treated as undirected even if only one direction is listed and self loops
+are ignored.
+
+The colors used by the neighbours of a vertex are kept as a bitset in a
+python integer, so finding the smallest free color is a couple of integer
+operations.
+"""
+
+import heapq
+import timeit
+
+from algoyoga_test import BaseTest
+from algoyoga_bench import BaseBench
+
+### interface ###
+
+def greedy_color(graph):
+    """ Color the graph greedily in smallest-last order. """
+    nodes, adj = _compact(graph)
+    colors = _first_fit(adj, _smallest_last_order(adj))
+    return dict(zip(nodes, colors))
+
+def dsatur_color(graph, deadline=None):
+    """ Color the graph with the DSATUR heuristic. If the deadline (a value
+    of timeit.default_timer) passes, the remaining vertices are colored
+    greedily, so a valid coloring is always returned. """
+    nodes, adj = _compact(graph)
+    return dict(zip(nodes, _dsatur(adj, deadline)))
+
+def best_color(graph, time_budget=None):
+    """ Color the graph greedily in smallest-last order and then with
+    DSATUR and return the coloring that uses fewer colors. If time_budget
+    (in seconds) is given, DSATUR is cut short when it runs out (the greedy
+    coloring is always computed, it takes linear time). """
+    start = timeit.default_timer()
+    nodes, adj = _compact(graph)
+    best = _first_fit(adj, _smallest_last_order(adj))
+    deadline = None if time_budget is None else start + time_budget
+    if deadline is None or timeit.default_timer() < deadline:
+        colors = _dsatur(adj, deadline)
+        if num_colors(colors) < num_colors(best):
+            best = colors
+    return dict(zip(nodes, best))
+
+def num_colors(coloring):
+    """ Return the number of colors used by a coloring (a dict or a list). """
+    if isinstance(coloring, dict):
+        coloring = coloring.values()
+    return max(coloring) + 1 if coloring else 0
+
+#################
+
+def _compact(graph):
+    """ Number the nodes 0, 1, ..., n-1 and return the list of nodes and the
+    symmetric adjacency lists (without self loops and repeated edges) of the
+    numbered graph. """
+    nodes = list(graph)
+    index = {node: ind for ind, node in enumerate(nodes)}
+    adj = [set() for _ in nodes]
+    for node, neighbours in graph.iteritems():
+        x = index[node]
+        for neighbour in neighbours:
+            y = index[neighbour]
+            if x != y:
+                adj[x].add(y)
+                adj[y].add(x)
+    return nodes, [list(neighbours) for neighbours in adj]
+
+def _lowest_free(used):
+    """ Return the smallest color that is not in the bitset used. """
+    return ((~used) & (used+1)).bit_length() - 1
+
+def _smallest_last_order(adj):
+    """ Return the vertices in smallest-last order: the vertex of minimum
+    degree is put last, then it is removed from the graph and the rest is
+    ordered recursively. A bucket queue keyed by the current degree makes
+    this O(V+E). """
+    degree = [len(neighbours) for neighbours in adj]
+    buckets = [set() for _ in range(max(degree)+1 if degree else 0)]
+    for vertex, deg in enumerate(degree):
+        buckets[deg].add(vertex)
+    removed = [False]*len(adj)
+    order = []
+    low = 0 # no bucket below low is non-empty
+    for _ in range(len(adj)):
+        while not buckets[low]:
+            low += 1
+        vertex = buckets[low].pop()
+        removed[vertex] = True
+        order.append(vertex)
+        for neighbour in adj[vertex]:
+            if not removed[neighbour]:
+                deg = degree[neighbour]
+                buckets[deg].remove(neighbour)
+                buckets[deg-1].add(neighbour)
+                degree[neighbour] = deg-1
+        low = max(low-1, 0)
+    order.reverse()
+    return order
+
+def _first_fit(adj, order, colors=None):
+    """ Give every uncolored vertex in order the smallest color that is
+    not used by its neighbours. Return the list of colors. """
+    if colors is None:
+        colors = [-1]*len(adj)
+    for vertex in order:
+        if colors[vertex] != -1:
+            continue
+        used = 0
+        for neighbour in adj[vertex]:
+            if colors[neighbour] != -1:
+                used |= 1 << colors[neighbour]
+        colors[vertex] = _lowest_free(used)
+    return colors
+
+def _dsatur(adj, deadline=None):
+    """ DSATUR: always color the vertex whose neighbours use the most
+    distinct colors (its saturation), breaking ties by degree. The vertices
+    are kept in one heap per saturation level; a vertex is pushed again when
+    its saturation grows and stale entries are skipped when popped. """
+    size = len(adj)
+    colors = [-1]*size
+    neighbour_colors = [0]*size # bitset of the colors of the neighbours
+    saturation = [0]*size
+    buckets = [[(-len(adj[vertex]), vertex) for vertex in range(size)]]
+    heapq.heapify(buckets[0])
+    top = 0 # the highest saturation level that may be non-empty
+    for count in xrange(size):
+        if deadline is not None and count % 256 == 0 \
+                and timeit.default_timer() > deadline:
+            # out of time, color the rest greedily
+            return _first_fit(adj, range(size), colors)
+        while True:
+            while not buckets[top]:
+                top -= 1
+            _, vertex = heapq.heappop(buckets[top])
+            if colors[vertex] == -1 and saturation[vertex] == top:
+                break
+        color = _lowest_free(neighbour_colors[vertex])
+        colors[vertex] = color
+        bit = 1 << color
+        for neighbour in adj[vertex]:
+            if colors[neighbour] == -1 and not neighbour_colors[neighbour] & bit:
+                neighbour_colors[neighbour] |= bit
+                sat = saturation[neighbour] = saturation[neighbour] + 1
+                if sat == len(buckets):
+                    buckets.append([])
+                heapq.heappush(buckets[sat], (-len(adj[neighbour]), neighbour))
+                top = max(top, sat)
+    return colors
+
+class ColoringTest(BaseTest):
+    def __init__(self):
+        testlist = [self.test_small_graphs, self.test_random_graphs, self.test_time_budget]
+        super(ColoringTest,self).__init__("graph coloring", testlist)
+
+    def _is_proper(self, graph, coloring):
+        return set(coloring) == set(graph) and all(coloring[x] != coloring[y]
+                for x in graph for y in graph[x] if x != y)
+
+    def test_small_graphs(self):
+        """ test the colorings of graphs with known chromatic numbers """
+        complete = {n: [m for m in range(6) if m != n] for n in range(6)}
+        even_cycle = {n: [(n-1)%10, (n+1)%10] for n in range(10)}
+        odd_cycle = {n: [(n-1)%11, (n+1)%11] for n in range(11)}
+        one_way = {1: [2], 2: [3], 3: [1], 4: [4]} # a triangle listed one way
+        testcases = [(complete, 6), (even_cycle, 2), (odd_cycle, 3), (one_way, 3),
+                (dict(), 0)]
+        for testgraph, chromatic in testcases:
+            for colorfunc in [greedy_color, dsatur_color, best_color]:
+                coloring = colorfunc(testgraph)
+                assert self._is_proper(testgraph, coloring)
+                assert num_colors(coloring) == chromatic
+        return "test pass"
+
+    def test_random_graphs(self):
+        """ test that the colorings of random graphs are proper """
+        import graph # graph imports this module
+        for _ in range(10):
+            testgraph = graph.rand_sparse_graph(200, 1000)
+            for colorfunc in [greedy_color, dsatur_color, best_color]:
+                coloring = colorfunc(testgraph)
+                assert self._is_proper(testgraph, coloring)
+                # a greedy coloring never needs more than max degree + 1 colors
+                assert num_colors(coloring) <= max(map(len, testgraph.values())) + 1
+        return "test pass"
+
+    def test_time_budget(self):
+        """ test that the coloring is proper when DSATUR runs out of time """
+        import graph # graph imports this module
+        testgraph = graph.rand_sparse_graph(2000, 10000)
+        coloring = dsatur_color(testgraph, deadline=timeit.default_timer())
+        assert self._is_proper(testgraph, coloring)
+        coloring = best_color(testgraph, time_budget=0)
+        assert self._is_proper(testgraph, coloring)
+        return "test pass"
+
+class ColoringBench(BaseBench):
+    """ Benchmarks for the colorings of random graphs with an average degree
+    of about 10. """
+    def __init__(self):
+        workloads = [self.bench_greedy_color, self.bench_dsatur_color]
+        super(ColoringBench,self).__init__("coloring", workloads, [10**3, 10**4])
+
+    def bench_greedy_color(self, n):
+        """ greedy_color (smallest-last order) """
+        import graph # graph imports this module
+        testgraph = graph.rand_sparse_graph(n, 5*n)
+        return (lambda: greedy_color(testgraph)), n
+
+    def bench_dsatur_color(self, n):
+        """ dsatur_color """
+        import graph # graph imports this module
+        testgraph = graph.rand_sparse_graph(n, 5*n)
+        return (lambda: dsatur_color(testgraph)), n
+
+if __name__ == "__main__":
+    tester = ColoringTest()
+    tester.run_tests()
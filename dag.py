@@ -0,0 +1,376 @@
+#! /usr/bin/env python
+
+""" Topological ordering of directed acyclic graphs.
+
+The algorithms that are implemented in this module are:
+    toposort(graph) - topological order with Kahn's algorithm
+
+    toposort_dfs(graph) - topological order with depth first search
+
+    IncrementalTopoOrder - a topological order that is kept up to date while
+    edges are added (Pearce and Kelly's algorithm)
+
+The graph is a dict mapping nodes to the list of their successors. Nodes that
+only appear as successors are ordered too. If the graph has a cycle, a
+CycleError is raised; its cycle attribute is the list of nodes on the cycle
+(each node has an edge to the next one and the last one to the first one).
+"""
+
+import random
+from array import array
+
+from algoyoga_test import BaseTest
+from algoyoga_bench import BaseBench
+
+### interface ###
+
+def toposort(graph):
+    """ Return the nodes of a DAG in topological order (every edge points
+    forward). This is Kahn's algorithm on the graph stored in flat arrays:
+    nodes are output as their in-degree drops to zero. """
+    nodes, offsets, targets, _ = compact(graph)
+    size = len(nodes)
+    in_degree = array("l", [0])*size
+    for target in targets:
+        in_degree[target] += 1
+    order = [node for node in range(size) if in_degree[node] == 0]
+    ind = 0
+    while ind < len(order):
+        node = order[ind]
+        ind += 1
+        for edge in xrange(offsets[node], offsets[node+1]):
+            target = targets[edge]
+            in_degree[target] -= 1
+            if in_degree[target] == 0:
+                order.append(target)
+    if len(order) < size:
+        toposort_dfs(graph) # raises CycleError with the cycle
+    return [nodes[node] for node in order]
+
+def toposort_dfs(graph):
+    """ Return the nodes of a DAG in topological order: the reverse of the
+    order in which a depth first search finishes them. """
+    nodes, offsets, targets, _ = compact(graph)
+    size = len(nodes)
+    WHITE, GRAY, BLACK = 0, 1, 2 # unvisited, on the stack, finished
+    state = array("b", [WHITE])*size
+    parent = array("l", [-1])*size
+    finished = []
+    for root in range(size):
+        if state[root] != WHITE:
+            continue
+        state[root] = GRAY
+        stack = [(root, offsets[root])] # node, next edge to look at
+        while stack:
+            node, edge = stack[-1]
+            if edge == offsets[node+1]:
+                stack.pop()
+                state[node] = BLACK
+                finished.append(node)
+                continue
+            stack[-1] = (node, edge+1)
+            target = targets[edge]
+            if state[target] == WHITE:
+                state[target] = GRAY
+                parent[target] = node
+                stack.append((target, offsets[target]))
+            elif state[target] == GRAY: # back edge, follow the parents
+                cycle = [node]
+                while cycle[-1] != target:
+                    cycle.append(parent[cycle[-1]])
+                cycle.reverse()
+                raise CycleError("The graph has a cycle.", [nodes[ind] for ind in cycle])
+    finished.reverse()
+    return [nodes[node] for node in finished]
+
+#################
+
+class CycleError(Exception):
+    """ Raised when a cycle is found in a graph that should be acyclic. """
+    def __init__(self, message, cycle):
+        super(CycleError, self).__init__(message)
+        self.message = message
+        self.cycle = cycle
+
+def compact(graph, edges=None):
+    """ Number the nodes 0, 1, ..., n-1 and return the list of nodes and the
+    adjacency lists of the numbered graph in flat arrays: the successors of
+    node i are targets[offsets[i]:offsets[i+1]]. Nodes that only appear as
+    successors get an empty list.
+
+    For a weighted graph pass a function edges that returns the (successor,
+    weight) pairs of a node of graph; the weights are then returned in a
+    fourth array (which is None otherwise). """
+    nodes = list(graph)
+    index = {node: ind for ind, node in enumerate(nodes)}
+    offsets = array("l", [0])
+    targets = array("l")
+    weights = None if edges is None else array("d")
+    ind = 0
+    while ind < len(nodes): # nodes grows when we find new successors
+        node = nodes[ind]
+        if node not in graph:
+            successors = ()
+        elif edges is None:
+            successors = graph[node]
+        else:
+            pairs = list(edges(node))
+            successors = [successor for successor, _ in pairs]
+            weights.extend(weight for _, weight in pairs)
+        for successor in successors:
+            if successor not in index:
+                index[successor] = len(nodes)
+                nodes.append(successor)
+            targets.append(index[successor])
+        offsets.append(len(targets))
+        ind += 1
+    return nodes, offsets, targets, weights
+
+class IncrementalTopoOrder(object):
+    """ A topological order of a DAG that is updated when an edge is added,
+    with the algorithm of Pearce and Kelly. Adding an edge x -> y that
+    already points forward costs O(1). Otherwise only the nodes whose
+    position is between y and x and that are reachable from y or reach x
+    are searched and moved, so small changes to a large DAG stay cheap. An
+    edge that would close a cycle is rejected with a CycleError. """
+
+    def __init__(self, graph=None):
+        """ Start from a DAG (a dict mapping nodes to their successors), or
+        from an empty graph. """
+        self.nodes = [] # the node with index i
+        self.index = dict()
+        self.succ = [] # successor indices of every node index
+        self.pred = []
+        self.position = array("l") # position of every node index in the order
+        self.at = array("l") # node index at every position
+        if graph:
+            for node in toposort(graph):
+                self.add_node(node)
+            for node, successors in graph.iteritems():
+                for successor in successors:
+                    self.add_edge(node, successor)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, node):
+        return node in self.index
+
+    def order(self):
+        """ Return the nodes in topological order. """
+        return [self.nodes[ind] for ind in self.at]
+
+    def add_node(self, node):
+        """ Add a node to the end of the order (if it is not there yet). """
+        if node in self.index:
+            return
+        ind = len(self.nodes)
+        self.index[node] = ind
+        self.nodes.append(node)
+        self.succ.append(set())
+        self.pred.append(set())
+        self.position.append(ind)
+        self.at.append(ind)
+
+    def remove_edge(self, x, y):
+        """ Remove the edge x -> y (the order stays valid). """
+        x, y = self.index[x], self.index[y]
+        self.succ[x].discard(y)
+        self.pred[y].discard(x)
+
+    def add_edge(self, x, y):
+        """ Add the edge x -> y and update the order. Raise CycleError (and
+        leave the graph unchanged) if the edge would close a cycle. """
+        if x == y:
+            raise CycleError("The edge would create a cycle.", [x])
+        self.add_node(x)
+        self.add_node(y)
+        x, y = self.index[x], self.index[y]
+        position = self.position
+        lower, upper = position[y], position[x]
+        if lower > upper: # the edge already points forward
+            self.succ[x].add(y)
+            self.pred[y].add(x)
+            return
+        # nodes reachable from y that are not after x
+        forward = self._forward(y, x, upper)
+        # nodes that reach x that are not before y
+        backward = self._backward(x, lower)
+        # The affected nodes keep their positions as a set, but everything
+        # that reaches x comes first, then everything reachable from y.
+        forward.sort(key=position.__getitem__)
+        backward.sort(key=position.__getitem__)
+        affected = backward + forward
+        slots = sorted(position[ind] for ind in affected)
+        for ind, slot in zip(affected, slots):
+            position[ind] = slot
+            self.at[slot] = ind
+        self.succ[x].add(y)
+        self.pred[y].add(x)
+
+    def _forward(self, start, target, upper):
+        """ Return the nodes reachable from start with a position of at most
+        upper. Raise CycleError if target is among them. """
+        parent = {start: None}
+        stack = [start]
+        while stack:
+            node = stack.pop()
+            for successor in self.succ[node]:
+                if successor == target:
+                    cycle = [node]
+                    while parent[cycle[-1]] is not None:
+                        cycle.append(parent[cycle[-1]])
+                    cycle.reverse()
+                    cycle.insert(0, target)
+                    raise CycleError("The edge would create a cycle.",
+                            [self.nodes[ind] for ind in cycle])
+                if successor not in parent and self.position[successor] < upper:
+                    parent[successor] = node
+                    stack.append(successor)
+        return list(parent)
+
+    def _backward(self, start, lower):
+        """ Return the nodes that reach start with a position of at least lower. """
+        seen = set([start])
+        stack = [start]
+        while stack:
+            node = stack.pop()
+            for predecessor in self.pred[node]:
+                if predecessor not in seen and self.position[predecessor] > lower:
+                    seen.add(predecessor)
+                    stack.append(predecessor)
+        return list(seen)
+
+def _random_dag(n, m):
+    """ Return a random DAG with n nodes and about m edges (the edges point
+    from smaller to larger nodes, after shuffling the node names). """
+    names = range(n)
+    random.shuffle(names)
+    graph = {name: [] for name in names}
+    for _ in xrange(m):
+        x, y = sorted(random.sample(xrange(n), 2))
+        graph[names[x]].append(names[y])
+    return graph
+
+class DagTest(BaseTest):
+    def __init__(self):
+        testlist = [self.test_toposort, self.test_cycles, self.test_incremental]
+        super(DagTest,self).__init__("topological ordering", testlist)
+
+    def _is_topological(self, graph, order):
+        position = {node: ind for ind, node in enumerate(order)}
+        return len(position) == len(order) and all(position[x] < position[y]
+                for x in graph for y in graph[x])
+
+    def _is_cycle(self, graph, cycle):
+        return all(cycle[(ind+1)%len(cycle)] in graph.get(node, [])
+                for ind, node in enumerate(cycle))
+
+    def test_toposort(self):
+        """ test toposort and toposort_dfs """
+        chain = {"c": ["d"], "a": ["b"], "b": ["c"]}
+        for sortfunc in [toposort, toposort_dfs]:
+            assert sortfunc(chain) == ["a", "b", "c", "d"]
+            assert sortfunc(dict()) == []
+            for _ in range(20):
+                testgraph = _random_dag(100, 300)
+                order = sortfunc(testgraph)
+                assert sorted(order) == range(100)
+                assert self._is_topological(testgraph, order)
+        return "test pass"
+
+    def test_cycles(self):
+        """ test that cycles are reported """
+        testgraphs = [
+                {1: [2], 2: [3], 3: [1]},
+                {0: [1], 1: [2, 4], 2: [3], 3: [], 4: [5], 5: [1]},
+                {1: [1]},
+                ]
+        for testgraph in testgraphs:
+            for sortfunc in [toposort, toposort_dfs]:
+                try:
+                    sortfunc(testgraph)
+                except CycleError as error:
+                    assert self._is_cycle(testgraph, error.cycle)
+                else:
+                    assert False
+        return "test pass"
+
+    def test_incremental(self):
+        """ test IncrementalTopoOrder """
+        for _ in range(5):
+            dag = _random_dag(200, 400)
+            orderer = IncrementalTopoOrder(dag)
+            assert self._is_topological(dag, orderer.order())
+            for _ in range(300):
+                x, y = random.sample(xrange(200), 2)
+                try:
+                    orderer.add_edge(x, y)
+                except CycleError as error:
+                    # the rejected edge x -> y closes a path from y to x
+                    path = error.cycle
+                    assert path[0] == x and path[1] == y
+                    assert self._is_cycle(dict(dag, **{x: [y]}), path)
+                else:
+                    dag[x].append(y)
+                assert self._is_topological(dag, orderer.order())
+            x, y = 0, 1
+            if y in dag[x]:
+                orderer.remove_edge(x, y)
+                dag[x].remove(y)
+                assert self._is_topological(dag, orderer.order())
+        orderer = IncrementalTopoOrder()
+        orderer.add_edge("a", "b")
+        orderer.add_edge("b", "c")
+        orderer.add_node("d")
+        assert orderer.order() == ["a", "b", "c", "d"]
+        orderer.add_edge("d", "a")
+        assert orderer.order() == ["d", "a", "b", "c"]
+        try:
+            orderer.add_edge("c", "d")
+        except CycleError as error:
+            assert error.cycle == ["c", "d", "a", "b"]
+        else:
+            assert False
+        assert orderer.order() == ["d", "a", "b", "c"] and len(orderer) == 4
+        return "test pass"
+
+class DagBench(BaseBench):
+    """ Benchmarks for the topological orders of random DAGs with an average
+    out-degree of about 3. """
+    def __init__(self):
+        workloads = [self.bench_toposort, self.bench_toposort_dfs,
+                self.bench_incremental_add_edge]
+        super(DagBench,self).__init__("dag", workloads, [10**4, 10**5])
+
+    def bench_toposort(self, n):
+        """ toposort (Kahn's algorithm) """
+        dag = _random_dag(n, 3*n)
+        return (lambda: toposort(dag)), n
+
+    def bench_toposort_dfs(self, n):
+        """ toposort_dfs """
+        dag = _random_dag(n, 3*n)
+        return (lambda: toposort_dfs(dag)), n
+
+    def bench_incremental_add_edge(self, n):
+        """ adding 100 random edges to an IncrementalTopoOrder and removing them """
+        orderer = IncrementalTopoOrder(_random_dag(n, 3*n))
+        edges = [random.sample(xrange(n), 2) for _ in range(100)]
+        def run():
+            added = []
+            for x, y in edges:
+                if y in orderer.succ[orderer.index[x]]:
+                    continue # already there
+                try:
+                    orderer.add_edge(x, y)
+                    added.append((x, y))
+                except CycleError:
+                    pass
+            for x, y in added:
+                orderer.remove_edge(x, y)
+        return run, len(edges)
+
+if __name__ == "__main__":
+    tester = DagTest()
+    tester.run_tests()
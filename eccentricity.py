@@ -0,0 +1,231 @@
+#! /usr/bin/env python
+
+""" Eccentricities and the diameter of undirected graphs.
+
+The algorithms that are implemented in this module are:
+    eccentricity(graph, node) - the largest distance from node
+
+    diameter(graph, budget=None) - the largest eccentricity, with iFUB
+
+Computing all the eccentricities takes a BFS from every node. diameter uses
+the iFUB (iterative Fringe Upper Bound) algorithm instead: a double sweep
+finds a lower bound and a central node u, then the nodes are processed in
+decreasing distance from u. After every level of the BFS tree of u the
+upper bound drops, and on most real-world graphs the bounds meet after a
+few dozen BFS runs. With a budget on the number of BFS runs the search
+stops early and reports the bounds it has (besides the BFS runs, the graph
+is traversed once to find its components).
+
+The graph is a dict mapping nodes to the list of their neighbours. The
+diameter of a graph with several components is the largest diameter of its
+components.
+"""
+
+import collections
+
+import graphsearch
+from algoyoga_test import BaseTest
+from algoyoga_bench import BaseBench
+
+### interface ###
+
+def eccentricity(graph, node):
+    """ Return the largest distance between node and the other nodes in its
+    component. """
+    dist, _ = bfs_distances(graph, node)
+    return max(dist.itervalues())
+
+def diameter(graph, budget=None):
+    """ Return the diameter of graph as a DiameterResult. If budget is given,
+    at most that many BFS runs are made; if the bounds do not meet by then,
+    the result is not exact, but the diameter is between result.lower and
+    result.upper. """
+    engine = _DiameterEngine(graph, budget)
+    return engine.run()
+
+#################
+
+class DiameterResult(collections.namedtuple("DiameterResult", "lower upper bfs_runs")):
+    """ Bounds for the diameter and the number of BFS runs it took. """
+    @property
+    def exact(self):
+        return self.lower == self.upper
+
+def bfs_distances(graph, source):
+    """ Run a BFS from source with graphsearch. Return the distances from
+    source and the parents in the BFS tree of the nodes in its component. """
+    dist = {source: 0}
+    def proc_vertex_early(s_state, node):
+        parent = s_state.parents[node]
+        if parent is not None:
+            dist[node] = dist[parent]+1
+    def new_component(s_state, node):
+        if node != source:
+            return True # we are done with the component of source
+    gsearch = graphsearch.GraphSearch(graph, node=source, search_type="bfs",
+            process_vertex_early=proc_vertex_early, new_component=new_component)
+    gsearch.search()
+    return dist, gsearch.searchstate.parents
+
+class _BudgetExhausted(Exception):
+    """ Raised when the diameter engine runs out of BFS runs. """
+
+class _DiameterEngine(object):
+    """ The state of a diameter computation: the BFS budget, the best lower
+    bound found so far and the upper bound of the current component. """
+    def __init__(self, graph, budget):
+        self.graph = graph
+        self.budget = budget
+        self.bfs_runs = 0
+        self.lower = 0 # every eccentricity is a lower bound
+        self.component_upper = None
+
+    def _components(self):
+        """ Return the components of the graph (as lists of nodes). This one
+        traversal is not counted as a BFS run. """
+        components = []
+        def new_component(s_state, node):
+            components.append([])
+        def proc_vertex_early(s_state, node):
+            components[-1].append(node)
+        graphsearch.search(self.graph, search_type="bfs", new_component=new_component,
+                process_vertex_early=proc_vertex_early)
+        return components
+
+    def _eccentricity(self, graph, source):
+        """ Run a BFS from source. Return its eccentricity, the distances and
+        the BFS tree. """
+        if self.budget is not None and self.bfs_runs >= self.budget:
+            raise _BudgetExhausted()
+        self.bfs_runs += 1
+        dist, parents = bfs_distances(graph, source)
+        ecc = max(dist.itervalues())
+        self.lower = max(self.lower, ecc)
+        return ecc, dist, parents
+
+    def _bound(self, upper):
+        """ Lower the upper bound of the current component to upper. """
+        self.component_upper = min(self.component_upper, upper)
+
+    def run(self):
+        # A component of k nodes has a diameter of at most k-1. The BFS runs
+        # are made on the subgraph of one component at a time, so that they
+        # don't have to initialize a search state for the whole graph.
+        pending = [comp for comp in self._components() if len(comp) > 1]
+        upper = 0 # the largest diameter of the finished components
+        try:
+            while pending:
+                component = pending[-1]
+                self.component_upper = len(component)-1
+                subgraph = {node: self.graph[node] for node in component}
+                upper = max(upper, self._ifub(subgraph, component[0]))
+                pending.pop()
+        except _BudgetExhausted:
+            upper = max([upper, self.component_upper] +
+                    [len(component)-1 for component in pending[:-1]])
+        return DiameterResult(self.lower, upper, self.bfs_runs)
+
+    def _ifub(self, graph, start):
+        """ Return the diameter of a connected graph. """
+        # double sweep: the farthest node from the start node is likely to
+        # be on the periphery, and the middle of a longest shortest path
+        # from there is likely to be central
+        ecc, dist, _ = self._eccentricity(graph, start)
+        self._bound(2*ecc)
+        far = max(dist, key=dist.get)
+        ecc, dist, parents = self._eccentricity(graph, far)
+        self._bound(2*ecc)
+        center = max(dist, key=dist.get)
+        for _ in range(ecc//2):
+            center = parents[center]
+        level, center_dist, _ = self._eccentricity(graph, center)
+        self._bound(2*level)
+        fringes = collections.defaultdict(list) # the nodes at each distance
+        for node, distance in center_dist.iteritems():
+            fringes[distance].append(node)
+        lower = max(ecc, level)
+        # Two nodes closer to the center than level are at most 2*(level-1)
+        # apart, so once the eccentricities of the nodes at distance level
+        # are known, either one of them is the largest or the upper bound
+        # drops to 2*(level-1).
+        while self.component_upper > lower:
+            for node in fringes[level]:
+                node_ecc, _, _ = self._eccentricity(graph, node)
+                lower = max(lower, node_ecc)
+                if lower >= self.component_upper:
+                    return lower
+            if lower > 2*(level-1):
+                return lower
+            level -= 1
+            self._bound(2*level)
+        return lower
+
+def _brute_force_diameter(graph):
+    """ Return the diameter by running a BFS from every node. """
+    return max([eccentricity(graph, node) for node in graph] or [0])
+
+class EccentricityTest(BaseTest):
+    def __init__(self):
+        testlist = [self.test_small_graphs, self.test_random_graphs, self.test_budget]
+        super(EccentricityTest,self).__init__("eccentricity and diameter", testlist)
+
+    def test_small_graphs(self):
+        """ test diameter on graphs with known diameters """
+        path = {n: [m for m in [n-1, n+1] if 0 <= m < 50] for n in range(50)}
+        cycle = {n: [(n-1)%21, (n+1)%21] for n in range(21)}
+        complete = {n: [m for m in range(10) if m != n] for n in range(10)}
+        two_paths = dict(path)
+        two_paths.update({n: [m for m in [n-1, n+1] if 100 <= m < 110] for n in range(100, 110)})
+        testcases = [(path, 49), (cycle, 10), (complete, 1), (two_paths, 49),
+                ({1: []}, 0), (dict(), 0)]
+        for testgraph, expected in testcases:
+            result = diameter(testgraph)
+            assert result.exact and result.lower == expected
+        assert eccentricity(path, 0) == 49 and eccentricity(path, 25) == 25
+        assert diameter(path).bfs_runs == 3 # the double sweep settles it
+        assert diameter(complete).bfs_runs <= 3 + 10
+        return "test pass"
+
+    def test_random_graphs(self):
+        """ test diameter against the brute force computation """
+        import graph # graph imports this module
+        for n, m in [(100, 60), (100, 150), (200, 400), (300, 3000)]:
+            testgraph = graph.rand_sparse_graph(n, m)
+            result = diameter(testgraph)
+            assert result.exact and result.lower == _brute_force_diameter(testgraph)
+        return "test pass"
+
+    def test_budget(self):
+        """ test the bounds reported when the BFS budget runs out """
+        import graph # graph imports this module
+        testgraph = graph.rand_sparse_graph(300, 400)
+        true_diameter = _brute_force_diameter(testgraph)
+        for budget in range(0, 12):
+            result = diameter(testgraph, budget)
+            assert result.bfs_runs <= budget
+            assert result.lower <= true_diameter <= result.upper
+        return "test pass"
+
+class EccentricityBench(BaseBench):
+    """ Benchmarks for diameter on random graphs with an average degree of
+    about 4. Random graphs have wide fringes, so they are a hard case for
+    iFUB: expect a few hundred BFS runs at n=1000. """
+    def __init__(self):
+        workloads = [self.bench_diameter, self.bench_diameter_budget]
+        super(EccentricityBench,self).__init__("eccentricity", workloads, [10**2, 10**3])
+
+    def bench_diameter(self, n):
+        """ exact diameter with iFUB """
+        import graph # graph imports this module
+        testgraph = graph.rand_sparse_graph(n, 2*n)
+        return (lambda: diameter(testgraph)), n
+
+    def bench_diameter_budget(self, n):
+        """ diameter with a budget of 10 BFS runs """
+        import graph # graph imports this module
+        testgraph = graph.rand_sparse_graph(n, 2*n)
+        return (lambda: diameter(testgraph, budget=10)), n
+
+if __name__ == "__main__":
+    tester = EccentricityTest()
+    tester.run_tests()
@@ -7,39 +7,107 @@ The algorithms that are implemented in this module are:
 
     scc(graph) - find all strongly connected components in an directed graph
 
+    condensation(graph) - return the DAG of the strongly connected components
+
+    toposort(graph) - return the nodes of a DAG in topological order
+
+    diameter(graph, budget=None) - find the diameter of an undirected graph
+
     cycles(graph) - find all cycles in an undirected graph
 
+    bellman_ford(graph, x, y) - find the shortest path between two nodes in a
+    weighted graph with negative edge weights
+
+    color(graph, n) - find an n-coloring for the graph (heuristically)
+
     rand_graph(n, p) - return a random undirected graph and
     an edge probability of p (0 <= p <= 1)
 
     rand_dgraph(n, p) - return a random directed graph with n nodes and
     an edge probability of p (0 <= p <= 1)
 
+    rand_sparse_graph(n, m) - return a random undirected graph with n nodes
+    and about m edges
+
+The functions accept either a dict or a Graph object. A Graph object caches
+the results of these algorithms until the graph is modified through its
+methods, so use one if you ask the same graph several times.
+
 Author: Larion Garaczi
 Date: 2014
 """
 import random
+import functools
+import dag
 import graphsearch
 
+from collections import defaultdict, OrderedDict
 from algoyoga_test import BaseTest
+from algoyoga_bench import BaseBench
 
 ### interface ###
 
 def cycles(input_graph):
     """ Wrapper around Graph.cycles """
-    gr = Graph(input_graph)
+    gr = _as_graph(input_graph)
     return gr.cycles()
 
 def c_com(input_graph):
     """ Wrapper around Graph.c_com """
-    gr = Graph(input_graph)
+    gr = _as_graph(input_graph)
     return gr.c_com()
 
 def scc(input_graph):
     """ Wrapper around Graph.scc """
-    gr = Graph(input_graph)
+    gr = _as_graph(input_graph)
     return gr.scc()
 
+def condensation(input_graph):
+    """ Wrapper around Graph.condensation """
+    gr = _as_graph(input_graph)
+    return gr.condensation()
+
+def toposort(input_graph):
+    """ Wrapper around Graph.toposort """
+    gr = _as_graph(input_graph)
+    return gr.toposort()
+
+def diameter(input_graph, budget=None):
+    """ Return the diameter of an undirected graph as an
+    eccentricity.DiameterResult. With a budget on the number of BFS runs the
+    result may only give bounds (see eccentricity.diameter). """
+    import eccentricity # imported here, it is only needed for the diameter
+    gr = _as_graph(input_graph)
+    if budget is None:
+        return gr.diameter()
+    return eccentricity.diameter(gr.graph, budget)
+
+def bellman_ford(input_graph, x, y):
+    """ Return the shortest path from x to y as a list of nodes (or None if
+    there is no path) in a weighted graph: a dict mapping nodes to the list
+    of (neighbour, weight) pairs. The weights may be negative; a negative
+    cycle reachable from x raises shortest_paths.NegativeCycleError. """
+    import shortest_paths # imported here, it loads numpy if it is installed
+    if isinstance(input_graph, Graph):
+        input_graph = input_graph.graph
+    paths = shortest_paths.bellman_ford(input_graph, x)
+    if y not in paths.edges.index:
+        return None
+    return paths.path(y)
+
+def color(input_graph, n, time_budget=None):
+    """ Try to find an n-coloring for an undirected graph with the
+    heuristics in the coloring module (see coloring.best_color). Return a
+    dict mapping the nodes to colors 0, 1, ..., n-1, or None if no coloring
+    with at most n colors was found (the graph may still be n-colorable). """
+    import coloring # imported here, it is only needed for the coloring
+    if isinstance(input_graph, Graph):
+        input_graph = input_graph.graph
+    colors = coloring.best_color(input_graph, time_budget)
+    if coloring.num_colors(colors) > n:
+        return None
+    return colors
+
 def rand_graph(n, p):
     """ Generate a random undirected graph with n nodes and an
     edge probability of p.
@@ -65,6 +133,18 @@ def rand_dgraph(n, p):
                 graph[i].append(i2)
     return graph
 
+def rand_sparse_graph(n, m):
+    """ Generate a random undirected graph with n nodes and about m edges
+    (in O(n+m) time, unlike rand_graph, which tries every pair of nodes).
+    """
+    graph = {node: [] for node in range(n)}
+    for _ in xrange(m):
+        x, y = random.randrange(n), random.randrange(n)
+        if x != y:
+            graph[x].append(y)
+            graph[y].append(x)
+    return graph
+
 #################
 
 # TODO
@@ -74,21 +154,14 @@ def rand_dgraph(n, p):
 #
 # largest_perm(graph) - find the maximum permutation in a bipartite graph
 #
-# color(graph, n) - find an n-coloring for the graph
-#
 # shortest_path(graph, x, y) - find the shortest path between the nodes
 # x and y in an unweighted graph
 #
 # dijkstra(graph, x, y) - find the shortest path between two nodes in a
 # weighted graph
 #
-# bellman_ford(graph, x, y) - find the shortest path between two nodes in a
-# weighted graph
-#
 # floyd_warshall(graph) - find the shortest path between all pairs in a graph
 #
-# diameter(graph) - find the diameter of a graph
-#
 # transitive_closure(graph) - return the transitive closure of the graph
 #
 # articulaton_vertex(graph) - find the articulation vertices in a graph
@@ -118,14 +191,153 @@ def largest_perm(graph): #TODO: update docstring -> relation between natural num
         except ValueError:
             return perm
 
+def _as_graph(input_graph):
+    """ Return input_graph if it is a Graph object, otherwise wrap it in one
+    (without a cache, as it is only used once). """
+    if isinstance(input_graph, Graph):
+        return input_graph
+    return Graph(input_graph, cache_limit=0)
+
+def _result_size(result):
+    """ Estimate the size of a cached result: the number of items in it,
+    counting the items of the containers in it too. """
+    if isinstance(result, dict):
+        items = result.itervalues()
+    elif isinstance(result, (list, tuple, set, frozenset)):
+        items = result
+    else:
+        return 1
+    return 1 + sum(_result_size(item) for item in items)
+
+def _memoized(method):
+    """ Decorator for the Graph methods that compute something from the
+    graph. The results are kept in the cache of the Graph object until the
+    graph is modified. """
+    @functools.wraps(method)
+    def cached_method(self):
+        name = method.__name__
+        cache = self._cache
+        if name in cache:
+            entry = cache.pop(name)
+            cache[name] = entry # mark it as the most recently used one
+            return entry[0]
+        result = method(self)
+        if self.cache_limit <= 0:
+            return result
+        size = _result_size(result)
+        if size <= self.cache_limit:
+            cache[name] = (result, size)
+            self._cached_size += size
+            # evict the least recently used results
+            while self._cached_size > self.cache_limit:
+                _, (_, evicted_size) = cache.popitem(last=False)
+                self._cached_size -= evicted_size
+        return result
+    return cached_method
+
 class Graph(object):
-    """ Class for the graph algorithms. """
-    def __init__(self, graph):
+    """ Class for the graph algorithms. The results of the algorithms are
+    cached (the same object is returned until the graph changes, so don't
+    modify them). The cache is cleared whenever the graph is modified through
+    add_node, add_edge, remove_edge or remove_node and version is increased.
+    If you modify the underlying dict directly, call invalidate(). The total
+    size of the cached results (see _result_size) is kept under cache_limit
+    by evicting the least recently used ones.
+    """
+    def __init__(self, graph, cache_limit=10**6):
         """ Initialize the Graph object. This method just stores the graph to be
         processed.
         """
         self.graph = graph
-
+        self.version = 0
+        self.cache_limit = cache_limit
+        self._cache = OrderedDict() # method name -> (result, size)
+        self._cached_size = 0
+
+    def invalidate(self):
+        """ Forget all the cached results. """
+        self.version += 1
+        self._cache.clear()
+        self._cached_size = 0
+
+    def add_node(self, node):
+        """ Add node to the graph (if it is not in the graph yet). """
+        if node not in self.graph:
+            self.graph[node] = []
+            self.invalidate()
+
+    def add_edge(self, x, y, undirected=False):
+        """ Add the edge x -> y to the graph (and y -> x if undirected is
+        True). The nodes are added if necessary. """
+        self.add_node(x)
+        self.add_node(y)
+        self.graph[x].append(y)
+        if undirected and x != y:
+            self.graph[y].append(x)
+        self.invalidate()
+
+    def remove_edge(self, x, y, undirected=False):
+        """ Remove the edge x -> y from the graph (and y -> x if undirected
+        is True). """
+        self.graph[x].remove(y)
+        if undirected and x != y:
+            self.graph[y].remove(x)
+        self.invalidate()
+
+    def remove_node(self, node):
+        """ Remove node and all the edges incident to it from the graph. """
+        del self.graph[node]
+        for neighbours in self.graph.itervalues():
+            while node in neighbours:
+                neighbours.remove(node)
+        self.invalidate()
+
+    @_memoized
+    def degrees(self):
+        """ Return a dict mapping every node to the pair (out-degree,
+        in-degree). In an undirected graph both are the degree. """
+        in_degrees = dict.fromkeys(self.graph, 0)
+        for neighbours in self.graph.itervalues():
+            for neighbour in neighbours:
+                in_degrees[neighbour] += 1
+        return {node: (len(neighbours), in_degrees[node])
+                for node, neighbours in self.graph.iteritems()}
+
+    @_memoized
+    def condensation(self):
+        """ Return the condensation of a directed graph: the pair (components,
+        comp_edges), where components is the list of strongly connected
+        components (as returned by scc) and comp_edges maps the index of
+        every component to the set of indices of the components its edges
+        lead to (this is a DAG). """
+        components = self.scc()
+        comp_index = dict()
+        for ind, component in enumerate(components):
+            for node in component:
+                comp_index[node] = ind
+        comp_edges = {ind: set() for ind in range(len(components))}
+        for node, neighbours in self.graph.iteritems():
+            for neighbour in neighbours:
+                if comp_index[node] != comp_index[neighbour]:
+                    comp_edges[comp_index[node]].add(comp_index[neighbour])
+        return components, comp_edges
+
+    @_memoized
+    def toposort(self):
+        """ Return the nodes of a directed acyclic graph in topological order
+        (see dag.toposort). Raise dag.CycleError if the graph has a cycle.
+        Use dag.IncrementalTopoOrder to keep the order up to date while
+        edges are added. """
+        return dag.toposort(self.graph)
+
+    @_memoized
+    def diameter(self):
+        """ Return the diameter of an undirected graph (see
+        eccentricity.diameter). """
+        import eccentricity
+        return eccentricity.diameter(self.graph)
+
+    @_memoized
     def scc(self):
         """ Take a directed graph represented as an adjacency list (a dict
         mapping vertices to their neighbours) and return its strongly
@@ -172,6 +384,7 @@ class Graph(object):
                 process_edge = proc_edge, process_vertex_late = proc_vertex_late)
         return searchglobals.components
 
+    @_memoized
     def cycles(self):
         """ Return the cycles in an undirected graph. """
         graph = self.graph
@@ -191,6 +404,7 @@ class Graph(object):
         graphsearch.search(graph, search_type="dfs", process_edge = process_edge)
         return cycles
 
+    @_memoized
     def c_com(self):
         """ Take an undirected graph represented as an adjacency list (a dict)
         and return its connected components (as a list of sets).
@@ -211,7 +425,9 @@ class Graph(object):
 
 class GraphTest(BaseTest):
     def __init__(self):
-        testlist = [self.test_ccom, self.test_cycles, self.test_scc]
+        testlist = [self.test_ccom, self.test_cycles, self.test_scc,
+                self.test_condensation, self.test_cache, self.test_color,
+                self.test_toposort, self.test_diameter, self.test_bellman_ford]
         super(GraphTest,self).__init__("miscellaneous graph algorithms", testlist)
 
     def test_scc(self):
@@ -312,6 +528,138 @@ class GraphTest(BaseTest):
         assert all(cycle in cycle4_expected for cycle in cycle4_results)
         return "test pass"
 
+    def test_condensation(self):
+        """ Test condensation and degrees. """
+        testgraph = {1: [2], 2: [1, 3], 3: [4], 4: [3, 5], 5: []}
+        components, comp_edges = condensation(testgraph)
+        index = {frozenset(comp): ind for ind, comp in enumerate(components)}
+        c12, c34, c5 = [index[frozenset(nodes)] for nodes in [[1,2], [3,4], [5]]]
+        assert comp_edges == {c12: set([c34]), c34: set([c5]), c5: set()}
+        assert Graph(testgraph).degrees() == {1: (1, 1), 2: (2, 1), 3: (1, 2),
+                4: (2, 1), 5: (0, 1)}
+        assert condensation(dict()) == ([], dict())
+        return "test pass"
+
+    def test_cache(self):
+        """ Test the caching of results in Graph objects. """
+        gr = Graph({1: [2], 2: [1], 3: []})
+        comps = c_com(gr)
+        assert comps == [set([1, 2]), set([3])]
+        assert c_com(gr) is comps # cached
+        gr.add_edge(2, 3, undirected=True)
+        assert gr.version > 0
+        assert c_com(gr) == [set([1, 2, 3])]
+        gr.add_node(4)
+        assert c_com(gr) == [set([1, 2, 3]), set([4])]
+        gr.remove_edge(2, 3, undirected=True)
+        gr.remove_node(1)
+        assert c_com(gr) == [set([2]), set([3]), set([4])]
+        gr.graph[2].append(3) # direct modification needs invalidate
+        gr.graph[3].append(2)
+        gr.invalidate()
+        assert c_com(gr) == [set([2, 3]), set([4])]
+        # the result of c_com has a size of 4 (a list of a set of 2 nodes),
+        # the result of cycles has a size of 1 (an empty list)
+        small = Graph({1: [2], 2: [1]}, cache_limit=4)
+        comps = small.c_com()
+        small.cycles()
+        assert small.c_com() is not comps # evicted
+        assert small.cycles() == []
+        small.cache_limit = 5
+        comps = small.c_com()
+        small.cycles()
+        assert small.c_com() is comps
+        return "test pass"
+
+    def test_color(self):
+        """ Test the color function. """
+        wheel = {n: [(n-1)%6, (n+1)%6, 6] for n in range(6)}
+        wheel[6] = range(6)
+        assert color(wheel, 2) is None
+        colors = color(Graph(wheel), 3)
+        assert sorted(set(colors.values())) == [0, 1, 2]
+        assert all(colors[x] != colors[y] for x in wheel for y in wheel[x])
+        assert color(dict(), 0) == dict()
+        return "test pass"
+
+    def test_toposort(self):
+        """ Test the toposort function. """
+        gr = Graph({1: [3], 2: [3], 3: [4], 4: []})
+        order = toposort(gr)
+        assert order.index(1) < order.index(3) and order.index(2) < order.index(3)
+        assert order[2:] == [3, 4]
+        gr.add_edge(4, 1)
+        try:
+            toposort(gr)
+        except dag.CycleError as error:
+            assert error.cycle == [1, 3, 4]
+        else:
+            assert False
+        return "test pass"
+
+    def test_diameter(self):
+        """ Test the diameter function. """
+        grid = dict()
+        for x in range(10):
+            for y in range(10):
+                grid[x, y] = [(x+dx, y+dy) for dx, dy in [(1,0), (-1,0), (0,1), (0,-1)]
+                        if 0 <= x+dx < 10 and 0 <= y+dy < 10]
+        gr = Graph(grid)
+        result = diameter(gr)
+        assert result.exact and result.lower == 18
+        assert diameter(gr) is result # cached
+        result = diameter(grid, budget=1)
+        assert result.lower <= 18 <= result.upper
+        return "test pass"
+
+    def test_bellman_ford(self):
+        """ Test the bellman_ford function. """
+        prices = {
+                "usd": [("eur", 0.9), ("gbp", 2.0)],
+                "eur": [("gbp", -0.2)],
+                "gbp": [("jpy", 1.0)],
+                "jpy": [],
+                }
+        assert bellman_ford(prices, "usd", "jpy") == ["usd", "eur", "gbp", "jpy"]
+        assert bellman_ford(Graph(prices), "jpy", "usd") is None
+        assert bellman_ford(prices, "usd", "chf") is None
+        prices["jpy"].append(("usd", -2.0))
+        import shortest_paths
+        try:
+            bellman_ford(prices, "usd", "jpy")
+        except shortest_paths.NegativeCycleError as error:
+            assert sorted(error.cycle) == ["eur", "gbp", "jpy", "usd"]
+        else:
+            assert False
+        return "test pass"
+
+class GraphBench(BaseBench):
+    """ Benchmarks for the graph algorithms on random graphs with an
+    average degree of about 5. """
+    def __init__(self):
+        workloads = [self.bench_scc, self.bench_ccom, self.bench_ccom_cached, self.bench_cycles]
+        super(GraphBench,self).__init__("graph", workloads, [100, 1000])
+
+    def bench_scc(self, n):
+        """ scc on a random directed graph """
+        graph = rand_dgraph(n, 5.0/n)
+        return (lambda: scc(graph)), n
+
+    def bench_ccom(self, n):
+        """ c_com on a random undirected graph """
+        graph = rand_graph(n, 5.0/n)
+        return (lambda: c_com(graph)), n
+
+    def bench_ccom_cached(self, n):
+        """ repeated c_com on the same Graph object """
+        gr = Graph(rand_graph(n, 5.0/n))
+        return (lambda: c_com(gr)), n
+
+    def bench_cycles(self, n):
+        """ cycles on a random undirected graph """
+        graph = rand_graph(n, 5.0/n)
+        return (lambda: cycles(graph)), n
+
 if __name__ == "__main__":
     tester = GraphTest()
     tester.run_tests()
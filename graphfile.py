@@ -0,0 +1,233 @@
+#! /usr/bin/env python
+
+""" Compact binary file format for graphs, loaded by memory-mapping.
+
+Building the adjacency dict of a large graph takes a long time, so a graph
+can be saved once with write_graph and later opened with load_graph, which
+only maps the file into memory. The returned MappedGraph is a read-only
+mapping from nodes to their neighbours, so it can be passed to every
+function in graph and graphsearch instead of a dict. The pages of the file
+are shared by all the processes that load it.
+
+The nodes have to be integers. The file consists of (all numbers are little
+endian):
+
+    header     magic "AYGF", version (uint32), flags (uint32),
+               number of nodes n (uint64), number of edges m (uint64)
+    nodes      n int64s, the node ids in increasing order
+    offsets    n+1 int64s, the neighbours of the i-th node are
+               targets[offsets[i]:offsets[i+1]]
+    targets    m int64s, the node ids of the neighbours
+    weights    m float64s, the edge weights (only if the WEIGHTED flag is set)
+"""
+
+import mmap
+import bisect
+import struct
+import tempfile
+import collections
+
+import graph
+import graphsearch
+from search_index import int64_view, write_int64s
+from algoyoga_test import BaseTest
+from algoyoga_bench import BaseBench
+
+### interface ###
+
+def write_graph(input_graph, path, weighted=False):
+    """ Save a graph (a dict mapping nodes to the list of their neighbours)
+    to path. If weighted is True, the lists contain (neighbour, weight) pairs
+    instead of neighbours. """
+    MappedGraph.write(input_graph, path, weighted)
+
+def load_graph(path):
+    """ Memory-map a graph file written by write_graph. """
+    return MappedGraph(path)
+
+#################
+
+MAGIC = "AYGF"
+VERSION = 1
+WEIGHTED = 1 # the file contains edge weights
+DENSE = 2 # the nodes are exactly 0, 1, ..., n-1
+_HEADER = struct.Struct("<4sIIQQ")
+
+class MappedGraph(collections.Mapping):
+    """ A graph stored in a memory-mapped file. It behaves like a read-only
+    dict mapping every node to the list of its neighbours. The lists are
+    read from the file on every access. The node, offset and target arrays
+    are read through search_index.int64_view, so the file is mapped
+    copy-on-write (the pages are still shared, nothing writes to them). """
+
+    def __init__(self, path):
+        with open(path, "rb") as fileobj:
+            self._buf = mmap.mmap(fileobj.fileno(), 0, access=mmap.ACCESS_COPY)
+        magic, version, flags, n, m = _HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("{!s} is not a graph file".format(path))
+        self.weighted = bool(flags & WEIGHTED)
+        self._dense = bool(flags & DENSE)
+        self._n = n
+        self._m = m
+        offset = _HEADER.size
+        self._nodes = int64_view(self._buf, offset, n)
+        offset += 8*n
+        self._offsets = int64_view(self._buf, offset, n+1)
+        offset += 8*(n+1)
+        self._targets = int64_view(self._buf, offset, m)
+        self._weights_offset = offset + 8*m
+
+    @staticmethod
+    def write(input_graph, path, weighted=False):
+        """ Save input_graph to path (see write_graph). """
+        nodes = sorted(input_graph)
+        flags = 0
+        if weighted:
+            flags |= WEIGHTED
+        if nodes == range(len(nodes)):
+            flags |= DENSE
+        offsets = [0]
+        for node in nodes:
+            offsets.append(offsets[-1] + len(input_graph[node]))
+        with open(path, "wb") as fileobj:
+            fileobj.write(_HEADER.pack(MAGIC, VERSION, flags, len(nodes), offsets[-1]))
+            write_int64s(fileobj, nodes)
+            write_int64s(fileobj, offsets)
+            if weighted:
+                for node in nodes:
+                    write_int64s(fileobj, [target for target, _ in input_graph[node]])
+                for node in nodes:
+                    weights = [weight for _, weight in input_graph[node]]
+                    fileobj.write(struct.pack("<%dd" % len(weights), *weights))
+            else:
+                for node in nodes:
+                    write_int64s(fileobj, input_graph[node])
+
+    def _index(self, node):
+        """ Return the position of node in the node array. """
+        if not isinstance(node, (int, long)):
+            raise KeyError(node)
+        if self._dense:
+            ind = node
+        else:
+            ind = bisect.bisect_left(self._nodes, node)
+        if not (0 <= ind < self._n and self._nodes[ind] == node):
+            raise KeyError(node)
+        return ind
+
+    def _edge_range(self, node):
+        ind = self._index(node)
+        return self._offsets[ind], self._offsets[ind+1]
+
+    def __getitem__(self, node):
+        start, end = self._edge_range(node)
+        return list(self._targets[start:end])
+
+    def weights(self, node):
+        """ Return the weights of the edges of node (in the same order as
+        the neighbours). """
+        if not self.weighted:
+            raise ValueError("the graph has no edge weights")
+        start, end = self._edge_range(node)
+        return list(struct.unpack_from("<%dd" % (end-start), self._buf,
+            self._weights_offset + 8*start))
+
+    def __contains__(self, node):
+        try:
+            self._index(node)
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        if self._dense:
+            return iter(xrange(self._n))
+        return iter(self._nodes)
+
+    def __len__(self):
+        return self._n
+
+    def edge_count(self):
+        """ Return the number of edges (the length of all the adjacency lists). """
+        return self._m
+
+    def close(self):
+        self._buf.close()
+
+class GraphFileTest(BaseTest):
+    def __init__(self):
+        testlist = [self.test_roundtrip, self.test_algorithms]
+        super(GraphFileTest,self).__init__("binary graph files", testlist)
+
+    def _roundtrip(self, input_graph, weighted=False):
+        with tempfile.NamedTemporaryFile() as fileobj:
+            write_graph(input_graph, fileobj.name, weighted)
+            return load_graph(fileobj.name) # the mapping stays valid
+
+    def test_roundtrip(self):
+        """ test writing and loading graphs """
+        sparse = {3: [10, 3], 10: [], -5: [3, 3, 10]}
+        mapped = self._roundtrip(sparse)
+        assert dict(mapped) == sparse
+        assert 4 not in mapped and "a" not in mapped and 3 in mapped and -5 in mapped
+        assert mapped.edge_count() == 5 and not mapped.weighted
+        dense = graph.rand_dgraph(50, 0.1)
+        mapped = self._roundtrip(dense)
+        assert dict(mapped) == dense and 49 in mapped and 50 not in mapped
+        assert dict(self._roundtrip(dict())) == dict()
+        weighted = {0: [(1, 0.5), (2, -1.0)], 1: [], 2: [(0, 3.0)]}
+        mapped = self._roundtrip(weighted, weighted=True)
+        assert mapped[0] == [1, 2] and mapped.weights(0) == [0.5, -1.0]
+        assert mapped.weights(1) == [] and mapped.weights(2) == [3.0]
+        try:
+            mapped[3]
+        except KeyError:
+            pass
+        else:
+            assert False
+        return "test pass"
+
+    def test_algorithms(self):
+        """ test the graph algorithms on memory-mapped graphs """
+        dgraph = graph.rand_dgraph(100, 0.02)
+        mapped = self._roundtrip(dgraph)
+        canonical = lambda comps: sorted(sorted(comp) for comp in comps)
+        assert canonical(graph.scc(mapped)) == canonical(graph.scc(dgraph))
+        ugraph = graph.rand_graph(100, 0.02)
+        mapped = self._roundtrip(ugraph)
+        assert canonical(graph.c_com(mapped)) == canonical(graph.c_com(ugraph))
+        order = []
+        graphsearch.search(mapped, process_vertex_early=lambda s, v: order.append(v))
+        assert sorted(order) == range(100)
+        return "test pass"
+
+class GraphFileBench(BaseBench):
+    """ Benchmarks for memory-mapped graphs, with random directed graphs with
+    an average out-degree of about 5. """
+    def __init__(self):
+        workloads = [self.bench_load, self.bench_bfs_mapped]
+        super(GraphFileBench,self).__init__("graphfile", workloads, [100, 1000])
+
+    def _graph_file(self, n):
+        """ Return a temporary file (deleted when it is garbage collected)
+        containing a random graph. """
+        fileobj = tempfile.NamedTemporaryFile()
+        write_graph(graph.rand_dgraph(n, 5.0/n), fileobj.name)
+        return fileobj
+
+    def bench_load(self, n):
+        """ load a graph file """
+        fileobj = self._graph_file(n)
+        return (lambda: load_graph(fileobj.name)), n
+
+    def bench_bfs_mapped(self, n):
+        """ bfs traversal of a memory-mapped graph """
+        fileobj = self._graph_file(n)
+        mapped = load_graph(fileobj.name)
+        fileobj.close() # the mapping stays valid
+        return (lambda: graphsearch.search(mapped)), n+mapped.edge_count()
+
+if __name__ == "__main__":
+    tester = GraphFileTest()
+    tester.run_tests()
@@ -14,7 +14,10 @@ Author: Larion Garaczi
 Date: 2014 
 """
 
+import timeit
+
 from algoyoga_test import BaseTest
+from algoyoga_bench import BaseBench
 from collections import deque
 
 # TODO:
@@ -43,7 +46,8 @@ class GraphSearch(object):
     was initialized. 
     """
     def __init__(self, graph, node=None, search_type="bfs", 
-        process_vertex_early=None, process_vertex_late=None, process_edge=None, new_component=None):
+        process_vertex_early=None, process_vertex_late=None, process_edge=None, new_component=None,
+        stats=False):
         """ Initialize graph search. The only mandatory argument is the graph
         itself, which is represented as a dictionary mapping nodes to the
         list of their neighbours.
@@ -66,7 +70,11 @@ class GraphSearch(object):
         at the beginning of the search). The argument for new_component is the
         name of the first node of the new component. The parameter searchstate
         is a GraphSearchState object representing the current state of the
-        search. """
+        search.
+
+        If stats is True, the search collects statistics about itself (see
+        GraphSearchStats) in searchstate.stats. Otherwise searchstate.stats
+        is None and the search is not slowed down. """
         ### initialize search constants ###
         assert search_type in ["bfs", "dfs"]
         # initial node should be in the graph (when specified)
@@ -89,10 +97,30 @@ class GraphSearch(object):
 
         ### initialize search state ###
         self.searchstate = self.get_search_state()
+        if stats:
+            stats = self.searchstate.stats = GraphSearchStats()
+            # time the client defined functions
+            for name in ["process_vertex_early", "process_vertex_late",
+                    "process_edge", "new_component"]:
+                func = getattr(self, name)
+                if func is not do_nothing:
+                    setattr(self, name, stats.timed(name, func))
 
     def search(self):
         """ Traverse the graph. """ 
+        stats = self.searchstate.stats
+        if stats is None:
+            return self._search()
+        try:
+            return self._search()
+        finally:
+            stats._finish_component()
+            stats.runs += 1
+
+    def _search(self):
+        """ Traverse the graph (see search). """
         state = self.searchstate
+        stats = state.stats
         # go through the nodes in the graph
         for node in state._to_process:
             if node in state.processed: 
@@ -106,6 +134,10 @@ class GraphSearch(object):
                     return newcomp
                 state.discovered.add(node)
                 self.add_children(node, state)
+                if stats is not None:
+                    stats._start_component(node)
+                    stats.vertices += 1
+                    stats._update_frontier(state.frontier)
                 # early processing of root vertex
                 proc_vertex = self.process_vertex_early(state, node)
                 if proc_vertex is not None:
@@ -131,6 +163,8 @@ class GraphSearch(object):
                         continue
                     elif message == "edge": # traverse an edge
                         node_from , node_to = value
+                        if stats is not None:
+                            stats.edges += 1
                         # edge processing
                         proc_edge = self.process_edge(state, node_from, node_to)
                         if proc_edge is not None:
@@ -139,6 +173,9 @@ class GraphSearch(object):
                             state.discovered.add(node_to)
                             state.parents[node_to] = node_from
                             self.add_children(node_to, state)
+                            if stats is not None:
+                                stats.vertices += 1
+                                stats._update_frontier(state.frontier)
                             # early processing of vertex
                             proc_vertex = self.process_vertex_early(state, node_to)
                             if proc_vertex is not None:
@@ -175,6 +212,8 @@ class GraphSearchState(object):
                     for traversal.
         parents     A dictionary containing the parents of all the vertices in
                     the traversal tree
+        stats       A GraphSearchStats object if the search collects
+                    statistics, None otherwise
 
     object methods:
         
@@ -191,6 +230,7 @@ class GraphSearchState(object):
         elif search_type=="dfs":
             self.frontier = list()
         self._search_type = search_type
+        self.stats = None
         self.processed = set()
         self.discovered = set()
         self.parents = {node: None for node in graph.iterkeys()}
@@ -198,7 +238,7 @@ class GraphSearchState(object):
         nodes = list(graph.iterkeys())
         if initial_node is not None:
             self._to_process.append(initial_node)
-            nodes.remove(node)
+            nodes.remove(initial_node)
         self._to_process.extend(nodes)
 
     def _pop(self):
@@ -213,6 +253,96 @@ class GraphSearchState(object):
         self.frontier.append(node)
         self.discovered.add(node)
 
+class GraphSearchStats(object):
+    """ Statistics collected by a GraphSearch created with stats=True. The
+    public attributes are:
+
+        vertices         The number of vertices visited.
+        edges            The number of edges traversed.
+        peak_frontier    The largest size of the frontier (it contains a
+                         signal for every edge scheduled for traversal and for
+                         every vertex waiting for late processing).
+        callbacks        A dictionary mapping the names of the client defined
+                         functions (process_edge etc.) to the number of calls
+                         and the total time spent in them in seconds.
+        components       A list with the root, the number of vertices and
+                         edges and the time spent in seconds for every
+                         component, in the order of traversal.
+        seconds          The total time of the search in seconds.
+        runs             The number of searches (more than 1 after merging).
+
+    The statistics can be exported with as_dict and statistics of several
+    searches can be added up with merge. """
+
+    def __init__(self):
+        self.vertices = 0
+        self.edges = 0
+        self.peak_frontier = 0
+        self.callbacks = dict()
+        self.components = list()
+        self.seconds = 0.0
+        self.runs = 0
+        self._current = None # the component being traversed
+
+    def timed(self, name, func):
+        """ Return a wrapper around func that adds the number of calls and
+        the time spent in func to callbacks[name]. """
+        record = self.callbacks.setdefault(name, {"calls": 0, "seconds": 0.0})
+        timer = timeit.default_timer
+        def timed_func(*args):
+            start = timer()
+            try:
+                return func(*args)
+            finally:
+                record["calls"] += 1
+                record["seconds"] += timer()-start
+        return timed_func
+
+    def _update_frontier(self, frontier):
+        if len(frontier) > self.peak_frontier:
+            self.peak_frontier = len(frontier)
+
+    def _start_component(self, root):
+        """ Close the statistics of the previous component and open a new one. """
+        self._finish_component()
+        # remember the totals at the beginning of the component
+        self._current = (root, self.vertices, self.edges, timeit.default_timer())
+
+    def _finish_component(self):
+        if self._current is None:
+            return
+        root, vertices, edges, start = self._current
+        seconds = timeit.default_timer()-start
+        self.components.append({"root": root, "vertices": self.vertices-vertices,
+            "edges": self.edges-edges, "seconds": seconds})
+        self.seconds += seconds
+        self._current = None
+
+    def merge(self, other):
+        """ Add the statistics of another search to this one. """
+        self.vertices += other.vertices
+        self.edges += other.edges
+        self.peak_frontier = max(self.peak_frontier, other.peak_frontier)
+        for name, record in other.callbacks.iteritems():
+            own = self.callbacks.setdefault(name, {"calls": 0, "seconds": 0.0})
+            own["calls"] += record["calls"]
+            own["seconds"] += record["seconds"]
+        self.components.extend(other.components)
+        self.seconds += other.seconds
+        self.runs += other.runs
+
+    def as_dict(self):
+        """ Return the statistics as a dictionary (e.g. to dump it as JSON). """
+        return {
+                "vertices": self.vertices,
+                "edges": self.edges,
+                "peak_frontier": self.peak_frontier,
+                "callbacks": {name: dict(record) for name, record in self.callbacks.iteritems()},
+                "components": [dict(comp) for comp in self.components],
+                "seconds": self.seconds,
+                "runs": self.runs,
+                }
+
 class GraphSearchSignal(object):
     """ Container object used for signals in the search
     queue. """
@@ -232,7 +362,7 @@ class GraphSearchSignal(object):
 
 class GraphSearchTest(BaseTest):
     def __init__(self):
-        testlist = [self.test_search]
+        testlist = [self.test_search, self.test_stats]
         super(GraphSearchTest,self).__init__("graph traversal", testlist)
 
     def test_search(self):
@@ -276,6 +406,66 @@ class GraphSearchTest(BaseTest):
                 del listing[:]
         return "test pass"
 
+    def test_stats(self):
+        """ test the statistics collected by GraphSearch with stats=True """
+        testgraph = {
+                1: [2, 3],
+                2: [1, 3],
+                3: [1, 2, 4],
+                4: [],
+                5: [6], # second component
+                6: [],
+                }
+        for mode in ["bfs", "dfs"]:
+            gsearch = GraphSearch(testgraph, search_type=mode, stats=True,
+                    process_edge=lambda s_state, x, y: None)
+            gsearch.search()
+            stats = gsearch.searchstate.stats
+            assert stats.vertices == 6
+            assert stats.edges == 8
+            assert stats.peak_frontier >= 3
+            assert stats.callbacks["process_edge"]["calls"] == 8
+            assert "process_vertex_early" not in stats.callbacks
+            components = sorted((comp["vertices"], comp["edges"]) for comp in stats.components)
+            assert components == [(2, 1), (4, 7)]
+        # search without statistics
+        gsearch = GraphSearch(testgraph)
+        gsearch.search()
+        assert gsearch.searchstate.stats is None
+        # the search stops early
+        gsearch = GraphSearch(testgraph, stats=True, process_vertex_early=lambda s, v: v)
+        gsearch.search()
+        stats = gsearch.searchstate.stats
+        assert stats.vertices == 1 and len(stats.components) == 1
+        merged = GraphSearchStats()
+        merged.merge(stats)
+        merged.merge(stats)
+        exported = merged.as_dict()
+        assert exported["vertices"] == 2 and exported["runs"] == 2
+        assert exported["callbacks"]["process_vertex_early"]["calls"] == 2
+        return "test pass"
+
+class GraphSearchBench(BaseBench):
+    """ Benchmarks for the traversals on random directed graphs with an
+    average out-degree of about 5. """
+    def __init__(self):
+        workloads = [self.bench_bfs, self.bench_dfs]
+        super(GraphSearchBench,self).__init__("graphsearch", workloads, [100, 1000])
+
+    def _traversal(self, n, search_type):
+        import graph # graph imports this module
+        testgraph = graph.rand_dgraph(n, 5.0/n)
+        edges = sum(len(neighbours) for neighbours in testgraph.itervalues())
+        return (lambda: search(testgraph, search_type=search_type)), n+edges
+
+    def bench_bfs(self, n):
+        """ bfs traversal of a random directed graph """
+        return self._traversal(n, "bfs")
+
+    def bench_dfs(self, n):
+        """ dfs traversal of a random directed graph """
+        return self._traversal(n, "dfs")
+
 if __name__ == "__main__":
     tester = GraphSearchTest()
     tester.run_tests()
@@ -2,7 +2,12 @@
 
 # singly linked lists
 
+import random
+from array import array
+from algoyoga_bench import BaseBench
+
 class Node(object):
+    __slots__ = ("value", "succ") # no per node __dict__
     def __init__(self, value, succ=None):
         self.value= value
         self.succ = succ
@@ -14,15 +19,10 @@ class linked_list(object):
 
     def __init__(self, iterable):
         """ Make a linked list from an iterable.  """
-        it = iter(iterable)
-        try:
-            self.first = Node(it.next())
-        except StopIteration:
-            return None
-        end = self.first
-        for item in it:
-            end.set_next(Node(item))
-            end = end.succ
+        self.first = None
+        self.last = None # tail pointer for O(1) appends
+        for item in iterable:
+            self.append(item)
 
     def __iter__(self):
         """ Traverse the list. """
@@ -49,15 +49,34 @@ class linked_list(object):
         """
         if node == None:
             self.first = Node(val, succ=self.first)
+            if self.last is None:
+                self.last = self.first
             return
         right_node = node.succ
         new_node = Node(val, succ = right_node)
         node.set_next(new_node)
+        if node is self.last:
+            self.last = new_node
+
+    def append(self, val):
+        """ Insert a node with the value val at the end of the list in
+        O(1) time. Return the new node. """
+        new_node = Node(val)
+        if self.last is None:
+            self.first = new_node
+        else:
+            self.last.set_next(new_node)
+        self.last = new_node
+        return new_node
 
     def delete(self, node):
-        """Delete node from the singly linked list l_list."""
+        """Delete node from the singly linked list l_list. This takes
+        O(n) time as we have to find the predecessor of node. Use
+        dlinked_list if you need O(1) deletes."""
         if node == self.first: # check first if the node is first
             self.first = node.succ
+            if node is self.last:
+                self.last = None
             return
         # find predecessor
         pred = self.first
@@ -68,6 +87,380 @@ class linked_list(object):
                 return # node is not in l_list, can't delete
         succ = node.succ # successor
         pred.succ = succ
+        if node is self.last:
+            self.last = pred
+
+# doubly linked lists
+
+class DNode(object):
+    __slots__ = ("value", "pred", "succ")
+    def __init__(self, value, pred=None, succ=None):
+        self.value = value
+        self.pred = pred
+        self.succ = succ
+
+class dlinked_list(object):
+    """ Doubly linked list class. Appending, inserting and deleting
+    a node all take O(1) time. """
+
+    def __init__(self, iterable=()):
+        """ Make a doubly linked list from an iterable. """
+        self.first = None
+        self.last = None
+        self.length = 0
+        for item in iterable:
+            self.append(item)
+
+    def __iter__(self):
+        """ Traverse the list. """
+        curr = self.first
+        while curr is not None:
+            yield curr.value
+            curr = curr.succ
+
+    def __len__(self):
+        return self.length
+
+    def search(self, val):
+        """ Return the first node that contains the value val.
+        If not found return None.
+        """
+        curr = self.first
+        while curr is not None:
+            if curr.value == val:
+                return curr
+            curr = curr.succ
+        return None
+
+    def insert(self, val, node=None):
+        """ Insert a node with the value val behind node. If the node
+        parameter is not specified, insert at the beginning of the list.
+        Return the new node.
+        """
+        if node is None:
+            new_node = DNode(val, succ=self.first)
+            self.first = new_node
+        else:
+            new_node = DNode(val, pred=node, succ=node.succ)
+            node.succ = new_node
+        if new_node.succ is None:
+            self.last = new_node
+        else:
+            new_node.succ.pred = new_node
+        self.length += 1
+        return new_node
+
+    def append(self, val):
+        """ Insert a node with the value val at the end of the list.
+        Return the new node. """
+        return self.insert(val, self.last)
+
+    def delete(self, node):
+        """ Delete node from the list. """
+        if node.pred is None:
+            self.first = node.succ
+        else:
+            node.pred.succ = node.succ
+        if node.succ is None:
+            self.last = node.pred
+        else:
+            node.succ.pred = node.pred
+        node.pred = node.succ = None
+        self.length -= 1
+
+    def popleft(self):
+        """ Remove the first node and return its value. """
+        if self.first is None:
+            raise IndexError("pop from empty list")
+        node = self.first
+        self.delete(node)
+        return node.value
+
+class pooled_list(object):
+    """ Doubly linked list that keeps its nodes in parallel arrays
+    instead of separate objects. A node is identified by its integer
+    slot (returned by insert and append), deleted slots are reused via
+    a free list. Apart from the value itself a node takes two int32
+    links and one list slot (16 bytes on a 64 bit machine). """
+
+    NIL = -1 # the slot of the missing node
+
+    def __init__(self, iterable=()):
+        """ Make a pooled list from an iterable. """
+        self.values = []
+        self.preds = array("i")
+        self.succs = array("i")
+        self.first = self.NIL
+        self.last = self.NIL
+        self.free = self.NIL # free slots are chained through succs
+        self.length = 0
+        for item in iterable:
+            self.append(item)
+
+    def __iter__(self):
+        """ Traverse the list. """
+        values = self.values
+        succs = self.succs
+        slot = self.first
+        while slot != self.NIL:
+            yield values[slot]
+            slot = succs[slot]
+
+    def __len__(self):
+        return self.length
+
+    def value(self, slot):
+        """ Return the value stored in slot. """
+        return self.values[slot]
+
+    def _new_slot(self, val, pred, succ):
+        """ Store a node in a free slot (or a new one) and return the slot. """
+        if self.free == self.NIL:
+            self.values.append(val)
+            self.preds.append(pred)
+            self.succs.append(succ)
+            return len(self.values)-1
+        slot = self.free
+        self.free = self.succs[slot]
+        self.values[slot] = val
+        self.preds[slot] = pred
+        self.succs[slot] = succ
+        return slot
+
+    def insert(self, val, slot=NIL):
+        """ Insert a node with the value val behind the node in slot. If
+        slot is not specified, insert at the beginning of the list. Return
+        the slot of the new node.
+        """
+        if slot == self.NIL:
+            new_slot = self._new_slot(val, self.NIL, self.first)
+            self.first = new_slot
+        else:
+            new_slot = self._new_slot(val, slot, self.succs[slot])
+            self.succs[slot] = new_slot
+        succ = self.succs[new_slot]
+        if succ == self.NIL:
+            self.last = new_slot
+        else:
+            self.preds[succ] = new_slot
+        self.length += 1
+        return new_slot
+
+    def append(self, val):
+        """ Insert a node with the value val at the end of the list.
+        Return the slot of the new node. """
+        return self.insert(val, self.last)
+
+    def delete(self, slot):
+        """ Delete the node in slot from the list. """
+        pred = self.preds[slot]
+        succ = self.succs[slot]
+        if pred == self.NIL:
+            self.first = succ
+        else:
+            self.succs[pred] = succ
+        if succ == self.NIL:
+            self.last = pred
+        else:
+            self.preds[succ] = pred
+        self.values[slot] = None # don't keep the value alive
+        self.succs[slot] = self.free
+        self.free = slot
+        self.length -= 1
+
+    def popleft(self):
+        """ Remove the first node and return its value. """
+        if self.first == self.NIL:
+            raise IndexError("pop from empty list")
+        slot = self.first
+        val = self.values[slot]
+        self.delete(slot)
+        return val
+
+# skip lists
+
+class SkipNode(object):
+    __slots__ = ("value", "forward")
+    def __init__(self, value, level):
+        self.value = value
+        self.forward = [None]*level # successors on each level
+
+    @property
+    def succ(self):
+        """ The successor on the lowest level (as in Node). """
+        return self.forward[0]
+
+class skip_list(object):
+    """ Ordered set kept in a skip list. The lowest level is an ordinary
+    sorted linked list (first and succ work as in linked_list), the higher
+    levels skip over more and more nodes. Searching, inserting and
+    deleting take O(log n) expected time. """
+
+    MAX_LEVEL = 32
+    P = 0.25 # probability that a node reaches the next level
+
+    def __init__(self, iterable=()):
+        """ Make a skip list from the (unique) elements of an iterable. """
+        self.head = SkipNode(None, self.MAX_LEVEL)
+        self.level = 1 # number of levels in use
+        self.length = 0
+        # the elements are sorted, so we can just link them in at the
+        # end of every level
+        tails = [self.head]*self.MAX_LEVEL
+        for val in sorted(set(iterable)):
+            node = SkipNode(val, self._random_level())
+            for lvl in range(len(node.forward)):
+                tails[lvl].forward[lvl] = node
+                tails[lvl] = node
+            self.level = max(self.level, len(node.forward))
+            self.length += 1
+
+    @property
+    def first(self):
+        return self.head.forward[0]
+
+    def __iter__(self):
+        """ Traverse the list in increasing order. """
+        curr = self.head.forward[0]
+        while curr is not None:
+            yield curr.value
+            curr = curr.forward[0]
+
+    def __len__(self):
+        return self.length
+
+    def __contains__(self, val):
+        return self.search(val) is not None
+
+    def _random_level(self):
+        level = 1
+        while random.random() < self.P and level < self.MAX_LEVEL:
+            level += 1
+        return level
+
+    def _find_preds(self, val):
+        """ Return the last node before val on every level. """
+        preds = [self.head]*self.MAX_LEVEL
+        curr = self.head
+        for lvl in range(self.level-1, -1, -1):
+            succ = curr.forward[lvl]
+            while succ is not None and succ.value < val:
+                curr = succ
+                succ = curr.forward[lvl]
+            preds[lvl] = curr
+        return preds
+
+    def search(self, val):
+        """ Return the node that contains the value val.
+        If not found return None.
+        """
+        curr = self.head
+        for lvl in range(self.level-1, -1, -1):
+            succ = curr.forward[lvl]
+            while succ is not None and succ.value < val:
+                curr = succ
+                succ = curr.forward[lvl]
+        succ = curr.forward[0]
+        if succ is not None and succ.value == val:
+            return succ
+        return None
+
+    def insert(self, val):
+        """ Insert val into the skip list at its place in the order and
+        return its node. If val is already in the list, return the node
+        that contains it.
+        """
+        preds = self._find_preds(val)
+        succ = preds[0].forward[0]
+        if succ is not None and succ.value == val:
+            return succ
+        node = SkipNode(val, self._random_level())
+        for lvl in range(len(node.forward)):
+            node.forward[lvl] = preds[lvl].forward[lvl]
+            preds[lvl].forward[lvl] = node
+        self.level = max(self.level, len(node.forward))
+        self.length += 1
+        return node
+
+    def delete(self, node):
+        """ Delete node from the skip list. """
+        self.remove(node.value)
+
+    def remove(self, val):
+        """ Delete val from the skip list (if it is in the list). """
+        preds = self._find_preds(val)
+        node = preds[0].forward[0]
+        if node is None or node.value != val:
+            return
+        for lvl in range(len(node.forward)):
+            preds[lvl].forward[lvl] = node.forward[lvl]
+        while self.level > 1 and self.head.forward[self.level-1] is None:
+            self.level -= 1
+        self.length -= 1
+
+    def range(self, low, high):
+        """ Iterate over the values v in the list with low <= v < high. """
+        curr = self._find_preds(low)[0].forward[0]
+        while curr is not None and curr.value < high:
+            yield curr.value
+            curr = curr.forward[0]
+
+class LinkedListBench(BaseBench):
+    """ Benchmarks for the linked lists. """
+    def __init__(self):
+        workloads = [self.bench_linked_list_search, self.bench_skip_list_search,
+                self.bench_skip_list_insert_remove, self.bench_dlinked_list_queue,
+                self.bench_pooled_list_queue]
+        super(LinkedListBench, self).__init__("linked_lists", workloads, [10**4, 10**6])
+
+    def bench_linked_list_search(self, n):
+        """ 10 searches in a linked_list """
+        l_list = linked_list(xrange(n))
+        queries = [random.randrange(n) for _ in xrange(10)]
+        def run():
+            for query in queries:
+                l_list.search(query)
+        return run, len(queries)
+
+    def bench_skip_list_search(self, n):
+        """ 1000 searches in a skip_list """
+        s_list = skip_list(xrange(0, 2*n, 2))
+        queries = [random.randrange(2*n) for _ in xrange(1000)]
+        def run():
+            for query in queries:
+                s_list.search(query)
+        return run, len(queries)
+
+    def bench_skip_list_insert_remove(self, n):
+        """ 1000 inserts into a skip_list and then removing them """
+        s_list = skip_list(xrange(0, 2*n, 2))
+        values = [2*random.randrange(n)+1 for _ in xrange(1000)]
+        def run():
+            for val in values:
+                s_list.insert(val)
+            for val in values:
+                s_list.remove(val)
+        return run, 2*len(values)
+
+    def bench_dlinked_list_queue(self, n):
+        """ n appends and then n poplefts on a dlinked_list """
+        def run():
+            queue = dlinked_list()
+            for val in xrange(n):
+                queue.append(val)
+            while queue.first is not None:
+                queue.popleft()
+        return run, 2*n
+
+    def bench_pooled_list_queue(self, n):
+        """ n appends and then n poplefts on a pooled_list """
+        def run():
+            queue = pooled_list()
+            for val in xrange(n):
+                queue.append(val)
+            while queue.first != pooled_list.NIL:
+                queue.popleft()
+        return run, 2*n
 
 class ll_tests:
     """
@@ -88,9 +481,107 @@ class ll_tests:
     >>> my_ll.delete(my_ll.search(-1))
     >>> list(my_ll)
     [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+    >>> my_ll.delete(my_ll.search(10))
+    >>> my_ll.append(11).value
+    11
+    >>> list(my_ll)
+    [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 11]
+    >>> empty_ll = linked_list([])
+    >>> list(empty_ll)
+    []
+    >>> empty_ll.insert(1)
+    >>> empty_ll.append(2).value
+    2
+    >>> list(empty_ll)
+    [1, 2]
     """
     pass
 
+class dll_tests:
+    """
+    >>> my_dll = dlinked_list(range(5))
+    >>> len(my_dll)
+    5
+    >>> node = my_dll.insert(2.5, my_dll.search(2))
+    >>> my_dll.append(5).value
+    5
+    >>> list(my_dll)
+    [0, 1, 2, 2.5, 3, 4, 5]
+    >>> my_dll.delete(node)
+    >>> my_dll.delete(my_dll.last)
+    >>> my_dll.delete(my_dll.first)
+    >>> list(my_dll), len(my_dll)
+    ([1, 2, 3, 4], 4)
+    >>> [my_dll.popleft() for _ in range(4)]
+    [1, 2, 3, 4]
+    >>> list(my_dll), my_dll.first, my_dll.last
+    ([], None, None)
+    >>> my_dll.popleft()
+    Traceback (most recent call last):
+        ...
+    IndexError: pop from empty list
+    """
+
+class pooled_tests:
+    """
+    >>> queue = pooled_list(range(5))
+    >>> slot = queue.insert(2.5, 2)
+    >>> queue.value(slot)
+    2.5
+    >>> list(queue), len(queue)
+    ([0, 1, 2, 2.5, 3, 4], 6)
+    >>> queue.delete(slot)
+    >>> queue.delete(queue.last)
+    >>> queue.popleft()
+    0
+    >>> list(queue)
+    [1, 2, 3]
+    >>> len(queue.values) # the deleted slots will be reused
+    6
+    >>> [queue.append(val) for val in "abcd"]
+    [0, 4, 5, 6]
+    >>> list(queue)
+    [1, 2, 3, 'a', 'b', 'c', 'd']
+    >>> queue.insert("start")
+    7
+    >>> [queue.popleft() for _ in range(8)]
+    ['start', 1, 2, 3, 'a', 'b', 'c', 'd']
+    >>> queue.first == queue.last == pooled_list.NIL
+    True
+    """
+
+class skip_list_tests:
+    """
+    >>> s_list = skip_list([5, 1, 9, 3, 7, 3])
+    >>> list(s_list), len(s_list)
+    ([1, 3, 5, 7, 9], 5)
+    >>> s_list.search(7).value, s_list.search(7).succ.value
+    (7, 9)
+    >>> s_list.search(4) is None, 4 in s_list, 5 in s_list
+    (True, False, True)
+    >>> s_list.insert(4).value
+    4
+    >>> s_list.insert(4) is s_list.search(4)
+    True
+    >>> s_list.remove(1)
+    >>> s_list.delete(s_list.search(9))
+    >>> s_list.remove(100)
+    >>> list(s_list), len(s_list)
+    ([3, 4, 5, 7], 4)
+    >>> list(s_list.range(4, 7)), list(s_list.range(0, 100)), list(s_list.range(8, 9))
+    ([4, 5], [3, 4, 5, 7], [])
+    >>> values = random.sample(xrange(10000), 2000)
+    >>> big = skip_list()
+    >>> for val in values: _ = big.insert(val)
+    >>> list(big) == sorted(values)
+    True
+    >>> for val in values[:1000]: big.remove(val)
+    >>> list(big) == sorted(values[1000:])
+    True
+    >>> all((val in big) == (val in values[1000:]) for val in xrange(10000))
+    True
+    """
+
 if __name__=="__main__":
     import doctest
     doctest.testmod()
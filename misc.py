@@ -1,5 +1,14 @@
 #! /usr/bin/python
 
+import random
+
+from algoyoga_bench import BaseBench
+
+try:
+    import numpy
+except ImportError: # numpy is optional, it is only needed for uniq_array
+    numpy = None
+
 def uniq(lst):
     """ Take a sorted list and return a list with
     duplicates removed. Also return the length of
@@ -13,8 +22,200 @@ def uniq(lst):
     ([1, 2, 3], 3)
     >>> uniq([1,3,7])
     ([1, 3, 7], 3)
+    >>> uniq([])
+    ([], 0)
+    >>> data = sorted(random.randrange(20) for _ in range(200))
+    >>> uniq(data) == _quadratic_uniq(data)
+    True
     """
     lst2 = lst[:]
+    length = uniq_inplace(lst2)
+    return (lst2, length)
+
+def uniq_inplace(lst):
+    """ Remove the duplicates from a sorted list (or array) in place
+    in O(n) time and return the new length. The read cursor walks
+    through the list, the write cursor marks the end of the unique
+    prefix. The tail is cut off only once, at the end.
+
+    >>> lst = [1,1,2,3,3,3,4]
+    >>> uniq_inplace(lst)
+    4
+    >>> lst
+    [1, 2, 3, 4]
+    >>> from array import array
+    >>> arr = array("l", [5,5,5,6])
+    >>> uniq_inplace(arr), arr
+    (2, array('l', [5, 6]))
+    """
+    write = 0
+    for read in xrange(len(lst)):
+        current = lst[read]
+        if write == 0 or current != lst[write-1]:
+            lst[write] = current
+            write += 1
+    del lst[write:]
+    return write
+
+def iuniq(iterable):
+    """ Lazily remove the duplicates from a sorted iterable. Only the
+    last element is kept in memory.
+
+    >>> list(iuniq(iter([1,1,2,3,3,3,4])))
+    [1, 2, 3, 4]
+    >>> list(iuniq([]))
+    []
+    """
+    it = iter(iterable)
+    try:
+        last = it.next()
+    except StopIteration:
+        return
+    yield last
+    for current in it:
+        if current != last:
+            last = current
+            yield current
+
+def uniq_array(arr):
+    """ Take a sorted one dimensional numpy array and return a new array
+    with the duplicates removed. This compares every element with its
+    predecessor in one vectorized pass. """
+    if numpy is None:
+        raise ImportError("uniq_array needs numpy")
+    arr = numpy.asarray(arr)
+    if len(arr) == 0:
+        return arr.copy()
+    keep = numpy.empty(len(arr), dtype=bool)
+    keep[0] = True
+    numpy.not_equal(arr[1:], arr[:-1], out=keep[1:])
+    return arr[keep]
+
+def rotate_list(lst, N):
+    """ Returns the input list rotated by N positions.
+
+    >>> rotate_list([1,2,3,4,5,6], 2)
+    [5, 6, 1, 2, 3, 4]
+    >>> rotate_list([1,2,3,4,5,6], 5)
+    [2, 3, 4, 5, 6, 1]
+    >>> rotate_list([1,2,3,4,5,6], 18)
+    [1, 2, 3, 4, 5, 6]
+    >>> rotate_list([], 3)
+    []
+    """
+    if not lst:
+        return lst[:]
+    offset = len(lst) - N%len(lst)
+    return lst[offset:] + lst[:offset]
+
+class RotatedView(object):
+    """ A view of a sequence rotated by N positions (in the same
+    direction as rotate_list). Nothing is copied: indices are mapped
+    to the underlying sequence, so changes show up in both. Rotating
+    the view further takes O(1) time.
+
+    >>> ring = [1,2,3,4,5,6]
+    >>> view = RotatedView(ring, 2)
+    >>> list(view), len(view)
+    ([5, 6, 1, 2, 3, 4], 6)
+    >>> view[0], view[-1], view[1:4], view[::-2]
+    (5, 4, [6, 1, 2], [4, 2, 6])
+    >>> view[0] = 50
+    >>> ring
+    [1, 2, 3, 4, 50, 6]
+    >>> view.rotate(-3)
+    >>> list(view)
+    [2, 3, 4, 50, 6, 1]
+    >>> list(RotatedView([], 5))
+    []
+    """
+    def __init__(self, seq, N):
+        self.seq = seq
+        self.offset = 0 # the index in seq of the first element of the view
+        self.rotate(N)
+
+    def rotate(self, N):
+        """ Rotate the view by further N positions. """
+        if self.seq:
+            self.offset = (self.offset - N) % len(self.seq)
+
+    def __len__(self):
+        return len(self.seq)
+
+    def _index(self, ind):
+        length = len(self.seq)
+        if ind < 0:
+            ind += length
+        if not 0 <= ind < length:
+            raise IndexError("RotatedView index out of range")
+        ind += self.offset
+        if ind >= length:
+            ind -= length
+        return ind
+
+    def __getitem__(self, ind):
+        if isinstance(ind, slice):
+            return [self[i] for i in xrange(*ind.indices(len(self.seq)))]
+        return self.seq[self._index(ind)]
+
+    def __setitem__(self, ind, val):
+        self.seq[self._index(ind)] = val
+
+    def __iter__(self):
+        seq = self.seq
+        for ind in xrange(self.offset, len(seq)):
+            yield seq[ind]
+        for ind in xrange(self.offset):
+            yield seq[ind]
+
+def _reverse(seq, low, high):
+    """ Reverse seq[low:high] in place. """
+    high -= 1
+    while low < high:
+        seq[low], seq[high] = seq[high], seq[low]
+        low += 1
+        high -= 1
+
+def rotate_inplace(seq, N):
+    """ Rotate a mutable sequence (a list, an array or a writable
+    memoryview) by N positions in place, using O(1) extra memory. This
+    is the reversal algorithm: reversing the whole sequence and then
+    both parts separately rotates it.
+
+    >>> lst = [1,2,3,4,5,6]
+    >>> rotate_inplace(lst, 2)
+    >>> lst
+    [5, 6, 1, 2, 3, 4]
+    >>> from array import array
+    >>> arr = array("l", [1,2,3,4,5,6])
+    >>> rotate_inplace(arr, -1)
+    >>> arr
+    array('l', [2, 3, 4, 5, 6, 1])
+    >>> buf = bytearray("abcdef")
+    >>> rotate_inplace(memoryview(buf), 8)
+    >>> buf
+    bytearray(b'efabcd')
+    >>> empty = []
+    >>> rotate_inplace(empty, 3)
+    >>> empty
+    []
+    """
+    length = len(seq)
+    if length == 0:
+        return
+    N %= length
+    if N == 0:
+        return
+    _reverse(seq, 0, length)
+    _reverse(seq, 0, N)
+    _reverse(seq, N, length)
+
+def _quadratic_uniq(lst):
+    """ The old version of uniq, which deleted the duplicates one by one
+    (O(n^2) time). It is only kept as a reference for the benchmarks. """
+    lst2 = lst[:]
+    if not lst2:
+        return (lst2, 0)
     last = lst2[0]
     i=1
     while i<len(lst2):
@@ -26,23 +227,71 @@ def uniq(lst):
             i+=1
     return (lst2, len(lst2))
 
-def rotate_list(lst, N):
-    """ Returns the input list rotated by N positions.
+class MiscBench(BaseBench):
+    """ Benchmarks for uniq and the list rotations. """
+    def __init__(self):
+        workloads = [self.bench_quadratic_uniq, self.bench_uniq, self.bench_uniq_inplace,
+                self.bench_iuniq, self.bench_uniq_array, self.bench_rotate_list,
+                self.bench_rotate_inplace]
+        super(MiscBench, self).__init__("misc", workloads, [10**3, 10**5, 10**6])
 
-    >>> rotate_list([1,2,3,4,5,6], 2)
-    [5, 6, 1, 2, 3, 4]
-    >>> rotate_list([1,2,3,4,5,6], 5)
-    [2, 3, 4, 5, 6, 1]
-    >>> rotate_list([1,2,3,4,5,6], 18)
-    [1, 2, 3, 4, 5, 6]
+    def _sorted_ids(self, n):
+        return sorted(random.randrange(n//10+1) for _ in xrange(n))
+
+    def bench_quadratic_uniq(self, n):
+        """ the old delete-per-duplicate uniq (for reference, only up to 10^5
+        elements) """
+        if n > 10**5:
+            return None
+        data = self._sorted_ids(n)
+        return (lambda: _quadratic_uniq(data)), n
+
+    def bench_uniq(self, n):
+        """ uniq on a sorted list with 10 copies of every element """
+        data = self._sorted_ids(n)
+        return (lambda: uniq(data)), n
+
+    def bench_uniq_inplace(self, n):
+        """ uniq_inplace on a sorted list with 10 copies of every element """
+        data = self._sorted_ids(n)
+        return (lambda: uniq_inplace(data[:])), n
+
+    def bench_iuniq(self, n):
+        """ iuniq on a sorted list with 10 copies of every element """
+        data = self._sorted_ids(n)
+        def run():
+            for _ in iuniq(data):
+                pass
+        return run, n
+
+    def bench_uniq_array(self, n):
+        """ uniq_array on a sorted numpy array with 10 copies of every
+        element (only if numpy is installed) """
+        if numpy is None:
+            return None
+        data = numpy.array(self._sorted_ids(n))
+        return (lambda: uniq_array(data)), n
+
+    def bench_rotate_list(self, n):
+        """ rotate_list by a third of the length """
+        data = range(n)
+        return (lambda: rotate_list(data, n//3)), n
+
+    def bench_rotate_inplace(self, n):
+        """ rotate_inplace by a third of the length """
+        data = range(n)
+        return (lambda: rotate_inplace(data, n//3)), n
+
+class uniq_array_test:
+    """ (the tests only run if numpy is installed)
+
+    >>> if numpy is not None:
+    ...     data = sorted(random.randrange(50) for _ in range(1000))
+    ...     assert list(uniq_array(numpy.array(data))) == uniq(data)[0]
+    ...     assert list(uniq_array([1, 1, 2, 3, 3])) == [1, 2, 3]
+    ...     assert len(uniq_array(numpy.array([], dtype=int))) == 0
+    ...     assert list(uniq_array(numpy.array([7, 7, 7]))) == [7]
     """
-    lst2 = []
-    length = len(lst)
-    offset = length-N
-    for ind in xrange(length):
-        pos = (ind+offset)%length
-        lst2.append(lst[pos])
-    return lst2
 
 if __name__ == "__main__":
     import doctest
@@ -0,0 +1,65 @@
+#! /usr/bin/python
+
+""" Run the benchmarks of algorithm-yoga.
+
+usage: run_benchmarks.py [-h] [--warmup N] [--repeat N] [--sizes N [N ...]]
+                         [--json FILE] [--baseline FILE] [--tolerance T]
+                         [module [module ...]]
+
+Without arguments all the modules are benchmarked at their default sizes.
+With --json the results are saved as JSON; with --baseline they are compared
+against an earlier JSON file and the exit status is 1 if any workload got
+slower by more than the tolerance.
+"""
+
+import sys
+import json
+import platform
+import argparse
+import importlib
+
+from algoyoga_bench import BaseBench, compare
+
+BENCH_MODULES = ["binary_search", "search_index", "linked_lists", "misc", "sort",
+        "strings", "graphsearch", "graph", "graphfile", "coloring",
+        "dag", "eccentricity", "shortest_paths"]
+
+def find_benchmarks(module):
+    """ Return an instance of every BaseBench subclass defined in module. """
+    return [obj() for obj in vars(module).itervalues()
+            if isinstance(obj, type) and issubclass(obj, BaseBench)
+            and obj is not BaseBench and obj.__module__ == module.__name__]
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Run the algorithm-yoga benchmarks.")
+    parser.add_argument("modules", nargs="*", metavar="module", default=BENCH_MODULES)
+    parser.add_argument("--warmup", type=int, default=1, help="untimed runs per workload")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per workload")
+    parser.add_argument("--sizes", type=int, nargs="+", help="override the input sizes")
+    parser.add_argument("--json", metavar="FILE", help="save the results as JSON")
+    parser.add_argument("--baseline", metavar="FILE", help="compare with a saved JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+            help="allowed slowdown as a fraction of the baseline (default 0.1)")
+    args = parser.parse_args(argv)
+
+    results = dict()
+    for modname in args.modules:
+        module = importlib.import_module(modname)
+        for bench in find_benchmarks(module):
+            results.update(bench.run_benchmarks(args.warmup, args.repeat, args.sizes))
+    if args.json:
+        with open(args.json, "w") as fileobj:
+            json.dump({"python": platform.python_version(), "results": results},
+                    fileobj, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as fileobj:
+            baseline = json.load(fileobj)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for name, old, new in regressions:
+            print "REGRESSION {!s}: {:.6f} sec -> {:.6f} sec".format(name, old, new)
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,239 @@
+#! /usr/bin/python
+
+""" Static search index for repeated lookups in a sorted set of integers.
+
+Plain binary search jumps all over the array, so once the array is larger
+than the cache almost every probe is a cache miss. StaticSearchIndex stores
+the keys in Eytzinger (breadth first) order instead: the first probes of
+every search hit the same few cache lines at the beginning of the array and
+the children of a node are always next to each other.
+
+The index is built once and never changes. It can be saved to a file and
+memory-mapped later, so several processes can share the same pages. On
+little endian machines the mapped pages are read through a ctypes array, so
+a lookup in a loaded index costs about as much as in one built in memory;
+elsewhere every probe has to be unpacked with struct, which is several
+times slower than a plain binary search.
+"""
+
+import sys
+import mmap
+import ctypes
+import struct
+import tempfile
+import random
+from array import array
+
+import binary_search
+from algoyoga_bench import BaseBench
+
+_MAGIC = "AYSI"
+_HEADER = struct.Struct("<4sQ") # magic, number of keys
+_ITEM = struct.Struct("<q") # every number is stored as a little endian int64
+
+class MappedArray(object):
+    """ Read-only sequence of int64 values stored in a buffer (for example
+    an mmap object), starting at byte offset offset. """
+    def __init__(self, buf, offset, length):
+        self.buf = buf
+        self.offset = offset
+        self.length = length
+        self._unpack = _ITEM.unpack_from
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, ind):
+        if isinstance(ind, slice):
+            start, stop, step = ind.indices(self.length)
+            if step != 1:
+                return [self[pos] for pos in xrange(start, stop, step)]
+            count = max(stop-start, 0)
+            return list(struct.unpack_from("<%dq" % count, self.buf, self.offset + 8*start))
+        if ind < 0:
+            ind += self.length
+        if not 0 <= ind < self.length:
+            raise IndexError("MappedArray index out of range")
+        return self._unpack(self.buf, self.offset + 8*ind)[0]
+
+    def __iter__(self):
+        for ind in xrange(self.length):
+            yield self[ind]
+
+def int64_view(buf, offset, length):
+    """ Return a read-only sequence of the length int64s in buf starting at
+    byte offset offset. If the machine is little endian and buf is writable
+    (for example an mmap opened with ACCESS_COPY, whose pages are still
+    shared until they are written) this is a ctypes array over the buffer,
+    which is indexed without a function call; otherwise a MappedArray. """
+    if sys.byteorder == "little":
+        try:
+            return (ctypes.c_int64 * length).from_buffer(buf, offset)
+        except TypeError: # read-only buffer
+            pass
+    return MappedArray(buf, offset, length)
+
+def write_int64s(fileobj, values, chunksize=1<<16):
+    """ Write a sequence of integers to fileobj as little endian int64s. """
+    for start in xrange(0, len(values), chunksize):
+        chunk = values[start:start+chunksize]
+        fileobj.write(struct.pack("<%dq" % len(chunk), *chunk))
+
+class StaticSearchIndex(object):
+    """ Immutable set of integers with fast membership and rank queries.
+
+    >>> index = StaticSearchIndex([9, 1, 5, 3, 7, 7])
+    >>> 5 in index, 6 in index, 10 in index, 0 in index
+    (True, False, False, False)
+    >>> [index.rank(x) for x in range(11)]
+    [0, 0, 1, 1, 2, 2, 3, 3, 5, 5, 6]
+    >>> len(index)
+    6
+    >>> 1 in StaticSearchIndex([])
+    False
+    """
+    def __init__(self, keys):
+        """ Build the index from an iterable of integers. """
+        keys = sorted(keys)
+        self._size = len(keys)
+        # slot 0 is unused so that the children of slot k are 2k and 2k+1
+        self._layout = array("l", [0]) * (self._size+1)
+        self._ranks = array("l", [0]) * (self._size+1)
+        # fill the slots by an in-order traversal of the implicit tree
+        rank = 0
+        slot = 1
+        stack = []
+        while stack or slot <= self._size:
+            if slot <= self._size:
+                stack.append(slot)
+                slot = 2*slot
+            else:
+                slot = stack.pop()
+                self._layout[slot] = keys[rank]
+                self._ranks[slot] = rank
+                rank += 1
+                slot = 2*slot+1
+
+    def __len__(self):
+        return self._size
+
+    def _lower_bound_slot(self, item):
+        """ Return the slot of the smallest key that is >= item, or 0 if
+        there is no such key. """
+        layout = self._layout
+        size = self._size
+        slot = 1
+        while slot <= size:
+            slot = 2*slot + (layout[slot] < item)
+        # The bits of slot now spell out the path of the search (1 means
+        # that we went right). The answer is the last node where we went
+        # left, so drop the trailing ones and the zero before them.
+        return slot >> ((~slot) & (slot+1)).bit_length()
+
+    def __contains__(self, item):
+        slot = self._lower_bound_slot(item)
+        return slot != 0 and self._layout[slot] == item
+
+    def rank(self, item):
+        """ Return the number of keys that are smaller than item. """
+        slot = self._lower_bound_slot(item)
+        if slot == 0:
+            return self._size
+        return self._ranks[slot]
+
+    def save(self, path):
+        """ Save the index to a file that can be loaded with load(). """
+        with open(path, "wb") as fileobj:
+            fileobj.write(_HEADER.pack(_MAGIC, self._size))
+            write_int64s(fileobj, self._layout)
+            write_int64s(fileobj, self._ranks)
+
+    @classmethod
+    def load(cls, path):
+        """ Memory-map an index file written by save(). The keys are read
+        straight from the mapped pages, nothing is copied into memory. The
+        mapping is copy-on-write (so that ctypes can wrap it, see
+        int64_view), but the index never writes to it. """
+        with open(path, "rb") as fileobj:
+            buf = mmap.mmap(fileobj.fileno(), 0, access=mmap.ACCESS_COPY)
+        magic, size = _HEADER.unpack_from(buf, 0)
+        if magic != _MAGIC:
+            raise ValueError("{!s} is not a search index file".format(path))
+        index = cls.__new__(cls)
+        index._size = size
+        index._layout = int64_view(buf, _HEADER.size, size+1)
+        index._ranks = int64_view(buf, _HEADER.size + 8*(size+1), size+1)
+        return index
+
+class SearchIndexBench(BaseBench):
+    """ Benchmarks for StaticSearchIndex. Every run looks up 1000 keys. """
+    def __init__(self):
+        workloads = [self.bench_binary_search, self.bench_index, self.bench_mapped_index]
+        super(SearchIndexBench, self).__init__("search_index", workloads, [10**3, 10**5, 10**6])
+
+    def _input(self, n):
+        keys = sorted(random.sample(xrange(4*n), n))
+        queries = [random.randrange(4*n) for _ in xrange(1000)]
+        return keys, queries
+
+    def bench_binary_search(self, n):
+        """ membership test with binary_search.binary_search (for reference) """
+        keys, queries = self._input(n)
+        def run():
+            for query in queries:
+                binary_search.binary_search(keys, query) != -1
+        return run, len(queries)
+
+    def bench_index(self, n):
+        """ membership test with an in-memory StaticSearchIndex """
+        keys, queries = self._input(n)
+        index = StaticSearchIndex(keys)
+        def run():
+            for query in queries:
+                query in index
+        return run, len(queries)
+
+    def bench_mapped_index(self, n):
+        """ membership test with a memory-mapped StaticSearchIndex """
+        keys, queries = self._input(n)
+        fileobj = tempfile.NamedTemporaryFile()
+        StaticSearchIndex(keys).save(fileobj.name)
+        index = StaticSearchIndex.load(fileobj.name)
+        fileobj.close() # the mapping stays valid
+        def run():
+            for query in queries:
+                query in index
+        return run, len(queries)
+
+class unit_test:
+    """
+    >>> import tempfile
+    >>> keys = random.sample(xrange(-5000, 5000), 1000)
+    >>> index = StaticSearchIndex(keys)
+    >>> sorted_keys = sorted(keys)
+    >>> queries = range(-5100, 5100)
+    >>> all((q in index) == (q in sorted_keys) for q in queries)
+    True
+    >>> all(index.rank(q) == binary_search.lower_bound(sorted_keys, q) for q in queries)
+    True
+    >>> fileobj = tempfile.NamedTemporaryFile()
+    >>> index.save(fileobj.name)
+    >>> mapped = StaticSearchIndex.load(fileobj.name)
+    >>> fileobj.close()
+    >>> all((q in mapped) == (q in index) for q in queries)
+    True
+    >>> all(mapped.rank(q) == index.rank(q) for q in queries)
+    True
+    >>> import struct
+    >>> buf = struct.pack("<4q", 5, -1, 2**40, 7)
+    >>> list(MappedArray(buf, 8, 2)), list(int64_view(bytearray(buf), 8, 2))
+    ([-1, 1099511627776], [-1, 1099511627776])
+    >>> MappedArray(buf, 0, 4)[1:3], MappedArray(buf, 0, 4)[3:1], MappedArray(buf, 0, 4)[::2]
+    ([-1, 1099511627776], [], [5, 1099511627776])
+    >>> type(int64_view(buf, 0, 4)) is MappedArray # read-only buffer
+    True
+    """
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,495 @@
+#! /usr/bin/env python
+
+""" Single source shortest paths with negative edge weights.
+
+The algorithms that are implemented in this module are:
+    bellman_ford(graph, source=None) - relax every edge in passes until
+    nothing changes (vectorized with numpy if it is available)
+
+    spfa(graph, source=None) - Bellman-Ford with a queue of the vertices
+    whose distance changed (Shortest Path Faster Algorithm)
+
+The graph is a dict mapping nodes to the list of (neighbour, weight) pairs,
+a weighted graphfile.MappedGraph or an EdgeArrays object. For large graphs
+build the EdgeArrays once: the edges are kept in flat arrays sorted by their
+source (the edges of the i-th node are offsets[i]:offsets[i+1]), so a pass
+over tens of millions of edges needs no python objects per edge.
+
+Both functions return a ShortestPaths object. If a negative cycle is
+reachable from the source, a NegativeCycleError is raised; its cycle
+attribute is the list of nodes on the cycle (each node has an edge to the
+next one and the last one to the first one). It is found by following the
+predecessors of a vertex that is still improving. Without a source every
+node starts at distance 0 (as if there was an extra source with an edge of
+weight 0 to every node), so every negative cycle is reported.
+"""
+
+import random
+import tempfile
+import collections
+from array import array
+
+import dag
+from algoyoga_test import BaseTest
+from algoyoga_bench import BaseBench
+
+try:
+    import numpy
+except ImportError: # numpy is optional, without it the passes are pure python
+    numpy = None
+
+INF = float("inf")
+
+### interface ###
+
+def bellman_ford(graph, source=None, vectorized=None):
+    """ Return the shortest paths from source with the Bellman-Ford
+    algorithm. Every pass relaxes all the edges and the search stops early
+    after a pass that changes nothing. If vectorized is True (the default if
+    numpy is available) the passes are numpy operations on the edge arrays;
+    otherwise every pass is a python loop that updates the distances in
+    place. Raise NegativeCycleError if there is a negative cycle reachable
+    from source. """
+    edges = EdgeArrays.from_graph(graph)
+    if vectorized is None:
+        vectorized = numpy is not None
+    if vectorized:
+        if numpy is None:
+            raise ImportError("vectorized bellman_ford needs numpy")
+        dist, pred = _bellman_ford_numpy(edges, edges.index_of(source))
+    else:
+        dist, pred = _bellman_ford_python(edges, edges.index_of(source))
+    return ShortestPaths(edges, source, dist, pred)
+
+def spfa(graph, source=None):
+    """ Return the shortest paths from source with the queue based variant
+    of Bellman-Ford: only the edges of the vertices whose distance changed
+    are relaxed, which is much faster on sparse graphs. Raise
+    NegativeCycleError if there is a negative cycle reachable from source. """
+    edges = EdgeArrays.from_graph(graph)
+    dist, pred = _spfa(edges, edges.index_of(source))
+    return ShortestPaths(edges, source, dist, pred)
+
+#################
+
+class NegativeCycleError(Exception):
+    """ Raised when the graph has a negative cycle, so the shortest paths
+    are not defined. """
+    def __init__(self, message, cycle):
+        super(NegativeCycleError, self).__init__(message)
+        self.message = message
+        self.cycle = cycle
+
+class EdgeArrays(object):
+    """ A weighted directed graph in flat arrays. The nodes are numbered
+    0, 1, ..., n-1 (nodes[i] is the i-th node), the targets and weights of
+    the edges of node i are targets[offsets[i]:offsets[i+1]] and
+    weights[offsets[i]:offsets[i+1]]. """
+
+    def __init__(self, nodes, offsets, targets, weights):
+        self.nodes = nodes
+        self.index = {node: ind for ind, node in enumerate(nodes)}
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+
+    @classmethod
+    def from_graph(cls, graph):
+        """ Build the arrays of a graph (see the module docstring). Nodes
+        that only appear as targets get an empty list of edges. """
+        if isinstance(graph, cls):
+            return graph
+        weighted = getattr(graph, "weighted", None)
+        if weighted is not None: # a graphfile.MappedGraph
+            if not weighted:
+                raise ValueError("the graph has no edge weights")
+            edges = lambda node: zip(graph[node], graph.weights(node))
+        else:
+            edges = graph.__getitem__
+        return cls(*dag.compact(graph, edges))
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def edge_count(self):
+        return len(self.targets)
+
+    def index_of(self, node):
+        """ Return the number of node (None stays None). """
+        if node is None:
+            return None
+        return self.index[node]
+
+class ShortestPaths(object):
+    """ The result of a shortest path search: the distance of every node
+    from the source and the last edge of a shortest path to it. """
+
+    def __init__(self, edges, source, dist, pred):
+        self.edges = edges
+        self.source = source
+        self._dist = dist # by node number
+        self._pred = pred # number of the previous node or -1
+
+    def distance(self, node):
+        """ Return the length of a shortest path to node (inf if there is
+        no path). """
+        return float(self._dist[self.edges.index[node]])
+
+    def path(self, node):
+        """ Return the nodes of a shortest path to node, or None if there is
+        no path. Without a source the path starts at some node that has no
+        shorter path leading to it. """
+        ind = self.edges.index[node]
+        if self._dist[ind] == INF:
+            return None
+        path = [ind]
+        while self._pred[path[-1]] != -1:
+            path.append(self._pred[path[-1]])
+        path.reverse()
+        return [self.edges.nodes[ind] for ind in path]
+
+    def as_dict(self):
+        """ Return a dict mapping the reachable nodes to their distances. """
+        nodes = self.edges.nodes
+        return {nodes[ind]: float(dist) for ind, dist in enumerate(self._dist)
+                if dist != INF}
+
+def _initial(size, source):
+    """ Return the initial distances (as a list) """
+    if source is None:
+        return [0.0]*size
+    dist = [INF]*size
+    dist[source] = 0.0
+    return dist
+
+def _find_cycle(pred, starts):
+    """ Follow the predecessors from every vertex in starts and return the
+    first cycle found (as a list of vertices, in the direction of the
+    edges), or None if every walk ends at a vertex without a predecessor.
+    Every vertex is visited at most once in total. """
+    walk = dict() # vertex -> the number of the walk that visited it
+    for walk_id, vertex in enumerate(starts):
+        vertex = int(vertex)
+        while vertex != -1 and vertex not in walk:
+            walk[vertex] = walk_id
+            vertex = int(pred[vertex])
+        if vertex != -1 and walk[vertex] == walk_id: # we went around a cycle
+            cycle = [vertex]
+            ind = int(pred[vertex])
+            while ind != vertex:
+                cycle.append(ind)
+                ind = int(pred[ind])
+            cycle.reverse()
+            return cycle
+    return None
+
+def _negative_cycle(edges, cycle):
+    return NegativeCycleError("The graph has a negative cycle.",
+            [edges.nodes[ind] for ind in cycle])
+
+def _bellman_ford_python(edges, source):
+    """ Bellman-Ford with the distances updated in place during a pass (so
+    a pass often gets further than one edge along the paths). """
+    size = len(edges)
+    offsets, targets, weights = edges.offsets, edges.targets, edges.weights
+    dist = array("d", _initial(size, source))
+    pred = array("l", [-1])*size
+    passes = 0
+    while True:
+        changed = []
+        for node in xrange(size):
+            node_dist = dist[node]
+            if node_dist == INF:
+                continue
+            for edge in xrange(offsets[node], offsets[node+1]):
+                target = targets[edge]
+                new_dist = node_dist + weights[edge]
+                if new_dist < dist[target]:
+                    dist[target] = new_dist
+                    pred[target] = node
+                    changed.append(target)
+        if not changed:
+            return dist, pred
+        passes += 1
+        # Without a negative cycle every shortest path has at most size-1
+        # edges, so after size passes something has to be on a cycle. The
+        # predecessors may not close the cycle yet, then we keep going.
+        if passes >= size:
+            cycle = _find_cycle(pred, changed)
+            if cycle is not None:
+                raise _negative_cycle(edges, cycle)
+
+def _bellman_ford_numpy(edges, source):
+    """ Bellman-Ford where every pass relaxes all the edges at once with
+    numpy operations. Only the edges that improve their target are used to
+    update the distances (with minimum.at, as several edges may improve the
+    same target) and the predecessors. """
+    size = len(edges)
+    offsets = numpy.frombuffer(edges.offsets, dtype=numpy.dtype("l"))
+    targets = numpy.frombuffer(edges.targets, dtype=numpy.dtype("l"))
+    weights = numpy.frombuffer(edges.weights, dtype=numpy.float64)
+    sources = numpy.repeat(numpy.arange(size), numpy.diff(offsets))
+    dist = numpy.array(_initial(size, source), dtype=numpy.float64)
+    pred = numpy.full(size, -1, dtype=numpy.int64)
+    passes = 0
+    while True:
+        candidates = dist[sources] + weights
+        improving = candidates < dist[targets]
+        if not improving.any():
+            return dist, pred
+        from_nodes = sources[improving]
+        to_nodes = targets[improving]
+        candidates = candidates[improving]
+        numpy.minimum.at(dist, to_nodes, candidates)
+        best = candidates == dist[to_nodes] # the edges that won
+        pred[to_nodes[best]] = from_nodes[best]
+        passes += 1
+        if passes >= size: # see _bellman_ford_python
+            cycle = _find_cycle(pred, numpy.unique(to_nodes))
+            if cycle is not None:
+                raise _negative_cycle(edges, cycle)
+
+def _spfa(edges, source):
+    """ SPFA: a FIFO queue holds the vertices whose distance changed since
+    their edges were last relaxed. The number of edges on the current path
+    to every vertex is tracked; a path of size edges has to contain a
+    cycle. """
+    size = len(edges)
+    offsets, targets, weights = edges.offsets, edges.targets, edges.weights
+    dist = array("d", _initial(size, source))
+    pred = array("l", [-1])*size
+    length = array("l", [0])*size # the number of edges on the path
+    if source is None:
+        queue = collections.deque(xrange(size))
+    else:
+        queue = collections.deque([source])
+    in_queue = bytearray([0])*size
+    for node in queue:
+        in_queue[node] = 1
+    while queue:
+        node = queue.popleft()
+        in_queue[node] = 0
+        node_dist = dist[node]
+        for edge in xrange(offsets[node], offsets[node+1]):
+            target = targets[edge]
+            new_dist = node_dist + weights[edge]
+            if new_dist < dist[target]:
+                dist[target] = new_dist
+                pred[target] = node
+                length[target] = length[node] + 1
+                if length[target] >= size:
+                    cycle = _find_cycle(pred, [target])
+                    if cycle is not None:
+                        raise _negative_cycle(edges, cycle)
+                if not in_queue[target]:
+                    in_queue[target] = 1
+                    queue.append(target)
+    return dist, pred
+
+def _random_weighted_graph(n, m, low=-1.0, high=10.0, acyclic=False):
+    """ Return a random directed graph with n nodes, about m edges and
+    weights between low and high. If acyclic is True the edges point from
+    smaller to larger nodes, so the graph has no negative cycles. """
+    graph = {node: [] for node in range(n)}
+    for _ in xrange(m):
+        x, y = random.randrange(n), random.randrange(n)
+        if acyclic:
+            x, y = min(x, y), max(x, y)
+        if x != y:
+            graph[x].append((y, random.uniform(low, high)))
+    return graph
+
+def _priced_graph(n, m):
+    """ Return a random directed graph with n nodes, about m edges and many
+    negative weights, but without negative cycles: every weight is a
+    nonnegative cost plus price[x] - price[y] (the prices cancel out along
+    a cycle). """
+    price = [random.uniform(0.0, 20.0) for _ in range(n)]
+    graph = {node: [] for node in range(n)}
+    for _ in xrange(m):
+        x, y = random.randrange(n), random.randrange(n)
+        if x != y:
+            graph[x].append((y, random.uniform(0.0, 10.0) + price[x] - price[y]))
+    return graph
+
+def _reference_distances(graph, source):
+    """ Return the distances from source with a plain textbook
+    Bellman-Ford on the dict (for testing). """
+    nodes = set(graph) | set(target for edges in graph.values() for target, _ in edges)
+    dist = {node: INF for node in nodes}
+    dist[source] = 0.0
+    for _ in range(len(nodes)):
+        for node, edges in graph.items():
+            for target, weight in edges:
+                dist[target] = min(dist[target], dist[node] + weight)
+    return {node: d for node, d in dist.items() if d != INF}
+
+def _has_negative_cycle(graph):
+    """ Return True if graph has a negative cycle: after n passes of a
+    textbook Bellman-Ford from every node, an edge can still be relaxed. """
+    nodes = set(graph) | set(target for edges in graph.values() for target, _ in edges)
+    dist = {node: 0.0 for node in nodes}
+    for _ in range(len(nodes)):
+        for node, edges in graph.items():
+            for target, weight in edges:
+                dist[target] = min(dist[target], dist[node] + weight)
+    return any(dist[node] + weight < dist[target]
+            for node, edges in graph.items() for target, weight in edges)
+
+class ShortestPathsTest(BaseTest):
+    def __init__(self):
+        testlist = [self.test_small_graphs, self.test_random_graphs,
+                self.test_negative_cycles, self.test_mapped_graph, self.test_vectorized]
+        super(ShortestPathsTest,self).__init__("shortest paths with negative weights", testlist)
+
+    def _algorithms(self):
+        algorithms = [spfa, lambda graph, source=None: bellman_ford(graph, source, False)]
+        if numpy is not None:
+            algorithms.append(lambda graph, source=None: bellman_ford(graph, source, True))
+        return algorithms
+
+    def _is_negative_cycle(self, graph, cycle):
+        total = 0.0
+        for ind, node in enumerate(cycle):
+            weights = [weight for target, weight in graph.get(node, [])
+                    if target == cycle[(ind+1)%len(cycle)]]
+            if not weights:
+                return False
+            total += min(weights)
+        return total < 0
+
+    def test_small_graphs(self):
+        """ test the shortest paths in a small graph with negative edges """
+        testgraph = {
+                "a": [("b", 4), ("c", 2)],
+                "b": [("d", -3)],
+                "c": [("b", 1), ("d", 5)],
+                "d": [("e", 1)],
+                "f": [("a", -10)], # not reachable from a
+                }
+        for algorithm in self._algorithms():
+            paths = algorithm(testgraph, "a")
+            assert paths.as_dict() == {"a": 0, "b": 3, "c": 2, "d": 0, "e": 1}
+            assert paths.path("e") == ["a", "c", "b", "d", "e"]
+            assert paths.path("a") == ["a"]
+            assert paths.path("f") is None and paths.distance("f") == INF
+            assert algorithm(testgraph).distance("a") == -10
+            assert algorithm({1: []}, 1).as_dict() == {1: 0}
+        return "test pass"
+
+    def test_random_graphs(self):
+        """ test the distances against a textbook Bellman-Ford """
+        for ind in range(10):
+            if ind % 2:
+                testgraph = _random_weighted_graph(60, 200, acyclic=True)
+            else:
+                testgraph = _priced_graph(60, 200)
+            expected = _reference_distances(testgraph, 0)
+            for algorithm in self._algorithms():
+                paths = algorithm(testgraph, 0)
+                result = paths.as_dict()
+                assert set(result) == set(expected)
+                assert all(abs(result[node] - expected[node]) < 1e-9 for node in expected)
+                for node in expected: # the path has the right length
+                    path = paths.path(node)
+                    length = sum(min(weight for target, weight in testgraph[x] if target == y)
+                            for x, y in zip(path, path[1:]))
+                    assert abs(length - expected[node]) < 1e-9
+        return "test pass"
+
+    def test_negative_cycles(self):
+        """ test that negative cycles are found """
+        testgraphs = [
+                ({1: [(2, 1)], 2: [(3, -1)], 3: [(1, -1)]}, 1),
+                ({0: [(1, 1)], 1: [(2, 2)], 2: [(3, -5)], 3: [(1, 1)]}, 0),
+                ({0: [(0, -1)]}, 0),
+                ({0: [(1, 1)], 5: [(6, -1)], 6: [(5, -1)]}, None), # not reachable from 0
+                ]
+        for testgraph, source in testgraphs:
+            for algorithm in self._algorithms():
+                try:
+                    algorithm(testgraph, source)
+                except NegativeCycleError as error:
+                    assert self._is_negative_cycle(testgraph, error.cycle)
+                else:
+                    assert False
+        for _ in range(20):
+            testgraph = _random_weighted_graph(50, 100, low=-4.0)
+            expected = _has_negative_cycle(testgraph)
+            for algorithm in self._algorithms():
+                try:
+                    algorithm(testgraph)
+                except NegativeCycleError as error:
+                    assert expected and self._is_negative_cycle(testgraph, error.cycle)
+                else:
+                    assert not expected
+        # the negative cycle is not reachable from 0
+        testgraph = {0: [(1, 1)], 5: [(6, -1)], 6: [(5, -1)]}
+        for algorithm in self._algorithms():
+            assert algorithm(testgraph, 0).as_dict() == {0: 0, 1: 1}
+        return "test pass"
+
+    def test_mapped_graph(self):
+        """ test the algorithms on a weighted memory-mapped graph """
+        import graphfile # not needed by the algorithms, keep importing them cheap
+        testgraph = _random_weighted_graph(50, 150, acyclic=True)
+        with tempfile.NamedTemporaryFile() as fileobj:
+            graphfile.write_graph(testgraph, fileobj.name, weighted=True)
+            mapped = graphfile.load_graph(fileobj.name)
+        for algorithm in self._algorithms():
+            assert algorithm(mapped, 0).as_dict() == algorithm(testgraph, 0).as_dict()
+        return "test pass"
+
+    def test_vectorized(self):
+        """ test the numpy passes against the python passes (if numpy is
+        installed) """
+        if numpy is None:
+            try:
+                bellman_ford({1: []}, 1, vectorized=True)
+            except ImportError:
+                return "test pass (numpy is not installed)"
+            assert False
+        for _ in range(5):
+            edges = EdgeArrays.from_graph(_priced_graph(300, 1500))
+            for source in [0, None]:
+                expected = bellman_ford(edges, source, vectorized=False).as_dict()
+                result = bellman_ford(edges, source, vectorized=True).as_dict()
+                assert set(result) == set(expected)
+                assert all(abs(result[node] - expected[node]) < 1e-9 for node in expected)
+        # a long negative cycle, found only after many passes
+        ring = {node: [((node+1) % 500, 1.0)] for node in range(500)}
+        ring[499] = [(0, -500.0)]
+        try:
+            bellman_ford(ring, 0, vectorized=True)
+        except NegativeCycleError as error:
+            assert sorted(error.cycle) == range(500)
+        else:
+            assert False
+        return "test pass"
+
+class ShortestPathsBench(BaseBench):
+    """ Benchmarks for the shortest paths in random graphs with negative
+    weights but without negative cycles, with an average out-degree of
+    about 5. """
+    def __init__(self):
+        workloads = [self.bench_bellman_ford, self.bench_spfa, self.bench_edge_arrays]
+        super(ShortestPathsBench,self).__init__("shortest_paths", workloads, [10**3, 10**4])
+
+    def bench_bellman_ford(self, n):
+        """ bellman_ford on prebuilt edge arrays """
+        edges = EdgeArrays.from_graph(_priced_graph(n, 5*n))
+        return (lambda: bellman_ford(edges, 0)), edges.edge_count()
+
+    def bench_spfa(self, n):
+        """ spfa on prebuilt edge arrays """
+        edges = EdgeArrays.from_graph(_priced_graph(n, 5*n))
+        return (lambda: spfa(edges, 0)), edges.edge_count()
+
+    def bench_edge_arrays(self, n):
+        """ building the edge arrays of a dict """
+        testgraph = _priced_graph(n, 5*n)
+        return (lambda: EdgeArrays.from_graph(testgraph)), 5*n
+
+if __name__ == "__main__":
+    tester = ShortestPathsTest()
+    tester.run_tests()
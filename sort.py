@@ -5,6 +5,7 @@ import itertools
 from random import randrange
 from collections import defaultdict
 from algoyoga_test import BaseTest
+from algoyoga_bench import BaseBench
 
 def randlist(n, n2=1000):
     """ generate a random list of length n """
@@ -93,6 +94,27 @@ class SortTest(BaseTest):
                 assert range6_perm == range(6)
         return "test pass"
 
+class SortBench(BaseBench):
+    """ Benchmarks for the sorting algorithms on randlist inputs. """
+    def __init__(self):
+        workloads = [self.bench_s_sort, self.bench_i_sort, self.bench_count_sort]
+        super(SortBench,self).__init__("sort", workloads, [100, 300, 1000])
+
+    def bench_s_sort(self, n):
+        """ s_sort on a random list """
+        data = randlist(n)
+        return (lambda: s_sort(data[:])), n
+
+    def bench_i_sort(self, n):
+        """ i_sort on a random list """
+        data = randlist(n)
+        return (lambda: i_sort(data[:])), n
+
+    def bench_count_sort(self, n):
+        """ count_sort on a random list """
+        data = randlist(n)
+        return (lambda: count_sort(data)), n
+
 if __name__ == "__main__":
     tester = SortTest()
     tester.run_tests()
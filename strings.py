@@ -4,6 +4,8 @@ import random
 import itertools
 import math
 
+from algoyoga_bench import BaseBench
+
 def string_hash(text, mod):
     """ Return a hash value for an ASCII string. The value will be
     between 0 and mod-1. It is advisable to use a prime number
@@ -82,6 +84,18 @@ def generate_primes(start):
             yield n
 
 
+class StringsBench(BaseBench):
+    """ Benchmarks for rk_search on long texts. """
+    def __init__(self):
+        workloads = [self.bench_rk_search]
+        super(StringsBench, self).__init__("strings", workloads, [10**3, 10**4, 10**5])
+
+    def bench_rk_search(self, n):
+        """ rk_search for a pattern at the end of a random text of length n """
+        text = "".join(random.choice("abcd") for _ in xrange(n))
+        pattern = text[-20:]
+        return (lambda: rk_search(text, pattern)), n
+
 def unit_test():
     # check if string_hash makes fairly evenly distributed hashes
     bigprime = 10007